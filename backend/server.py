@@ -1,11 +1,15 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Form, Depends, status, Request
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Form, Depends, status, Request, Query
+from fastapi.security import HTTPBasic, HTTPBasicCredentials, HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.responses import Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
 import os
+import json
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
@@ -13,13 +17,31 @@ from typing import List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
 import secrets
-import bcrypt
 import base64
 from enum import Enum
 import shutil
 from services.email_service import email_service
-from services.pdf_service import pdf_service
-from services.visitor_tracking import track_visitor
+from services.email_outbox import email_outbox
+from services.visitor_tracking import enrichment_cache_stats, visitor_queue
+from services.visitor_rollups import get_visitor_stats
+from services.auth_cache import admin_auth_cache
+from services.password_hashing import password_hasher
+from services.pdf_worker import PDFQueueFull, PDFRenderTimeout, pdf_render_pool
+from services.pdf_cache import pdf_cache, pdf_cache_key
+from services.admin_session import admin_sessions
+from services.db_indexes import ensure_indexes
+from services.pagination import encode_cursor, after_cursor_filter, NEWEST_FIRST
+from services.streaming import ndjson_response
+from services.product_search import product_search
+from services.catalog_cache import catalog_cache
+from services.http_cache import cached_json, make_etag, not_modified
+from services.settings_store import public_settings, settings_store
+from services.thumbnails import ensure_file_thumbnail
+from services.uploads import get_upload_dir
+from services.customer_stats import (
+    record_quote_created, record_quote_changed, record_quote_deleted,
+    remove_customer_stats, get_customer_stats
+)
 from google.oauth2 import id_token
 from google.auth.transport import requests as google_requests
 
@@ -36,14 +58,16 @@ db = client[os.environ['DB_NAME']]
 app = FastAPI()
 
 # Mount static files for uploads
-UPLOAD_DIR = Path(__file__).parent / "uploads"
-UPLOAD_DIR.mkdir(exist_ok=True)
+UPLOAD_DIR = get_upload_dir()
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 security = HTTPBasic()
+optional_basic = HTTPBasic(auto_error=False)
+bearer_security = HTTPBearer(auto_error=False)
 
 # Enums
 class QuoteStatus(str, Enum):
@@ -533,21 +557,53 @@ class CompanySettings(BaseModel):
     header_cart_button_bg: str = "#22C55E"
     header_cart_button_text_color: str = "#FFFFFF"
 
+catalog_cache.configure(Product, Category, Brand)
+
 # Helper functions
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
 
-def get_password_hash(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+async def get_password_hash(password: str) -> str:
+    return await password_hasher.hash(password)
 
-async def get_current_admin(credentials: HTTPBasicCredentials = Depends(security)):
+async def get_current_admin(
+    bearer: Optional[HTTPAuthorizationCredentials] = Depends(bearer_security),
+    credentials: Optional[HTTPBasicCredentials] = Depends(optional_basic)
+):
+    # Session tokens from admin_login are verified locally (revocations are polled, not looked up per request)
+    if bearer:
+        admin = await admin_sessions.verify(db, bearer.credentials)
+        if not admin:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Oturum geçersiz veya süresi dolmuş",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        return admin
+    
+    if not credentials:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Kimlik doğrulama gerekli",
+            headers={"WWW-Authenticate": "Basic"},
+        )
+    
+    # Repeat requests with recently verified credentials skip Mongo and bcrypt,
+    # unless any worker has revoked the admin's sessions since
+    await admin_sessions.refresh(db)
+    epochs = admin_sessions.epochs
+    cached = admin_auth_cache.get(credentials.username, credentials.password, epochs)
+    if cached:
+        return cached
+    
     admin = await db.admins.find_one({"username": credentials.username}, {"_id": 0})
-    if not admin or not verify_password(credentials.password, admin["password_hash"]):
+    if not admin or not await verify_password(credentials.password, admin["password_hash"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Hatalı kullanıcı adı veya şifre",
             headers={"WWW-Authenticate": "Basic"},
         )
+    admin_auth_cache.put(credentials.username, credentials.password, admin, epochs.get(admin.get("id"), 0))
     return admin
 
 # Routes
@@ -565,9 +621,9 @@ async def admin_login(login: AdminLogin):
     
     # Normal admin login
     admin = await db.admins.find_one({"username": login.username}, {"_id": 0})
-    if not admin or not verify_password(login.password, admin["password_hash"]):
+    if not admin or not await verify_password(login.password, admin["password_hash"]):
         raise HTTPException(status_code=401, detail="Hatalı kullanıcı adı veya şifre")
-    return {"success": True, "username": admin["username"]}
+    return {"success": True, "username": admin["username"], **(await admin_sessions.issue(db, admin))}
 
 @api_router.post("/admin/init")
 async def init_admin():
@@ -578,7 +634,7 @@ async def init_admin():
     
     admin = Admin(
         username="admin",
-        password_hash=get_password_hash("admin123")
+        password_hash=await get_password_hash("admin123")
     )
     await db.admins.insert_one(admin.model_dump())
     return {"message": "Admin oluşturuldu", "username": "admin", "password": "admin123"}
@@ -615,7 +671,7 @@ async def create_admin_user(new_admin: AdminCreate, admin: dict = Depends(get_cu
         "id": str(uuid.uuid4()),
         "username": new_admin.username,
         "email": new_admin.email,
-        "password_hash": get_password_hash(new_admin.password),
+        "password_hash": await get_password_hash(new_admin.password),
         "role": new_admin.role,
         "permissions": new_admin.permissions,
         "created_at": datetime.now(timezone.utc).isoformat(),
@@ -641,7 +697,7 @@ async def update_admin_user(admin_id: str, update_data: AdminUpdate, admin: dict
     if update_data.email:
         update_dict["email"] = update_data.email
     if update_data.password:
-        update_dict["password_hash"] = get_password_hash(update_data.password)
+        update_dict["password_hash"] = await get_password_hash(update_data.password)
     if update_data.role:
         update_dict["role"] = update_data.role
     if update_data.permissions:
@@ -655,6 +711,8 @@ async def update_admin_user(admin_id: str, update_data: AdminUpdate, admin: dict
     result = await db.admins.update_one({"id": admin_id}, {"$set": update_dict})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Admin bulunamadı")
+    admin_auth_cache.invalidate(admin_id=admin_id)
+    await admin_sessions.revoke(db, admin_id)
     
     return {"message": "Admin güncellendi"}
 
@@ -671,18 +729,35 @@ async def delete_admin_user(admin_id: str, admin: dict = Depends(get_current_adm
     result = await db.admins.delete_one({"id": admin_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Admin bulunamadı")
+    admin_auth_cache.invalidate(admin_id=admin_id)
+    await admin_sessions.revoke(db, admin_id)
     
     return {"message": "Admin silindi"}
 
+@api_router.get("/admin/metrics")
+async def get_admin_metrics(admin: dict = Depends(get_current_admin)):
+    """Runtime metrics for in-process caches and worker pools"""
+    return {
+        "auth_cache": admin_auth_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "pdf_render_pool": pdf_render_pool.stats(),
+        "pdf_cache": pdf_cache.stats(),
+        "email_outbox": await email_outbox.stats(db),
+        "smtp_pool": email_service.pool.stats(),
+        "visitor_queue": visitor_queue.stats(),
+        "visitor_enrichment": enrichment_cache_stats(),
+    }
+
 # Category endpoints
 @api_router.get("/categories", response_model=List[Category])
-async def get_categories():
-    categories = await db.categories.find({}, {"_id": 0}).to_list(1000)
-    return categories
+async def get_categories(request: Request):
+    await catalog_cache.ensure_fresh(db)
+    return cached_json(request, catalog_cache.categories_json, make_etag("categories", catalog_cache.version))
 
 @api_router.post("/categories", response_model=Category)
 async def create_category(category: Category, admin: dict = Depends(get_current_admin)):
     await db.categories.insert_one(category.model_dump())
+    await catalog_cache.bump(db)
     return category
 
 @api_router.put("/categories/{category_id}", response_model=Category)
@@ -695,6 +770,7 @@ async def update_category(category_id: str, category_update: CategoryUpdate, adm
     if update_data:
         await db.categories.update_one({"id": category_id}, {"$set": update_data})
         category.update(update_data)
+        await catalog_cache.bump(db)
     
     return Category(**category)
 
@@ -703,40 +779,39 @@ async def delete_category(category_id: str, admin: dict = Depends(get_current_ad
     result = await db.categories.delete_one({"id": category_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Kategori bulunamadı")
+    await catalog_cache.bump(db)
     return {"message": "Kategori silindi"}
 
 # Product endpoints
 @api_router.get("/products", response_model=List[Product])
 async def get_products(
+    request: Request,
     category: Optional[str] = None,
     search: Optional[str] = None,
     sort_by: Optional[str] = None,
     sort_order: Optional[str] = "asc",
     low_stock: Optional[bool] = None
 ):
-    query = {}
-    if category:
-        query["category"] = category
-    
+    # Served from the in-memory catalog snapshot
+    await catalog_cache.ensure_fresh(db)
+    etag = make_etag("products", catalog_cache.version, request.url.query)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    ranked_ids = None
     if search:
-        query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"description": {"$regex": search, "$options": "i"}}
-        ]
-    
-    if low_stock:
-        # Find products where stock_quantity <= minimum_stok
-        query["$expr"] = {"$lte": ["$stock_quantity", "$minimum_stok"]}
-    
-    # Sorting
-    sort_field = sort_by if sort_by else "created_at"
-    sort_direction = 1 if sort_order == "asc" else -1
-    
-    products = await db.products.find(query, {"_id": 0}).sort(sort_field, sort_direction).to_list(1000)
-    for product in products:
-        if isinstance(product.get('created_at'), str):
-            product['created_at'] = datetime.fromisoformat(product['created_at'])
-    return products
+        # Turkish-aware prefix search, best match first
+        ranked_ids = product_search.search(search)
+    
+    content = catalog_cache.query_products(
+        category=category,
+        ranked_ids=ranked_ids,
+        low_stock=bool(low_stock),
+        sort_field=sort_by,
+        descending=sort_order != "asc"
+    )
+    return cached_json(request, content, etag)
 
 @api_router.get("/products/low-stock/list")
 async def get_low_stock_products(admin: dict = Depends(get_current_admin)):
@@ -759,13 +834,12 @@ async def get_low_stock_products(admin: dict = Depends(get_current_admin)):
     return low_stock_products
 
 @api_router.get("/products/{product_id}", response_model=Product)
-async def get_product(product_id: str):
-    product = await db.products.find_one({"id": product_id}, {"_id": 0})
-    if not product:
+async def get_product(product_id: str, request: Request):
+    await catalog_cache.ensure_fresh(db)
+    content = catalog_cache.product_json(product_id)
+    if content is None:
         raise HTTPException(status_code=404, detail="Ürün bulunamadı")
-    if isinstance(product.get('created_at'), str):
-        product['created_at'] = datetime.fromisoformat(product['created_at'])
-    return product
+    return cached_json(request, content, make_etag("product", catalog_cache.version, product_id))
 
 @api_router.post("/products", response_model=Product)
 async def create_product(product_data: ProductCreate, admin: dict = Depends(get_current_admin)):
@@ -773,6 +847,7 @@ async def create_product(product_data: ProductCreate, admin: dict = Depends(get_
     doc = product.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     await db.products.insert_one(doc)
+    await catalog_cache.bump(db)
     return product
 
 @api_router.put("/products/{product_id}", response_model=Product)
@@ -785,6 +860,7 @@ async def update_product(product_id: str, product_update: ProductUpdate, admin:
     if update_data:
         await db.products.update_one({"id": product_id}, {"$set": update_data})
         product.update(update_data)
+        await catalog_cache.bump(db)
     
     if isinstance(product.get('created_at'), str):
         product['created_at'] = datetime.fromisoformat(product['created_at'])
@@ -795,6 +871,7 @@ async def delete_product(product_id: str, admin: dict = Depends(get_current_admi
     result = await db.products.delete_one({"id": product_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Ürün bulunamadı")
+    await catalog_cache.bump(db)
     return {"message": "Ürün silindi"}
 
 # Quote endpoints
@@ -804,39 +881,93 @@ async def create_quote(quote_data: QuoteCreate):
     doc = quote.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     await db.quotes.insert_one(doc)
+    await record_quote_created(db, doc)
     
-    # Send notification email to admin
+    # Queue notification email to admin
     try:
-        email_service.send_new_quote_notification(doc)
+        await email_outbox.enqueue(db, **email_service.compose_new_quote_notification(doc))
     except Exception as e:
-        logger.error(f"Failed to send quote notification email: {str(e)}")
+        logger.error(f"Failed to queue quote notification email: {str(e)}")
     
     return quote
 
+def _iso_utc(value: datetime) -> str:
+    """ISO string comparable with stored created_at values (naive = UTC)"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+def _validated_quote(doc: dict) -> Optional[Quote]:
+    try:
+        # Fix datetime strings
+        if isinstance(doc.get('created_at'), str):
+            doc['created_at'] = datetime.fromisoformat(doc['created_at'])
+        
+        # Attempt to validate against model
+        return Quote(**doc)
+    except Exception as e:
+        # Log error but don't crash the whole response
+        # Using print/logging since logger might not be configured globally
+        logging.error(f"Skipping invalid quote {doc.get('id', 'unknown')}: {str(e)}")
+        return None
+
 @api_router.get("/quotes", response_model=List[Quote])
-async def get_quotes(admin: dict = Depends(get_current_admin), status_filter: Optional[str] = None):
+async def get_quotes(
+    response: Response,
+    admin: dict = Depends(get_current_admin),
+    status_filter: Optional[str] = None,
+    email: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after: Optional[str] = None,
+    output_format: str = Query("json", alias="format", pattern="^(json|ndjson)$")
+):
+    """List quotes newest first; the next page cursor is in the X-Next-Cursor header.
+    format=ndjson streams every matching quote (after the optional cursor) and
+    rejects limit, since a truncated stream has no way to return a cursor."""
+    if output_format == "ndjson" and limit:
+        raise HTTPException(status_code=400, detail="format=ndjson ile limit kullanılamaz")
+    
     query = {}
     if status_filter:
         query["status"] = status_filter
+    if email:
+        query["email"] = email
+    if created_from or created_to:
+        query["created_at"] = {}
+        if created_from:
+            query["created_at"]["$gte"] = _iso_utc(created_from)
+        if created_to:
+            query["created_at"]["$lte"] = _iso_utc(created_to)
+    if after:
+        try:
+            query.update(after_cursor_filter(after))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Geçersiz sayfa imleci")
+    
+    if output_format == "ndjson":
+        cursor = db.quotes.find(query, {"_id": 0}).sort(NEWEST_FIRST)
+        
+        def to_record(doc):
+            quote = _validated_quote(doc)
+            return quote.model_dump(mode="json") if quote else None
+        
+        return ndjson_response(cursor, to_record)
+    
+    limit = limit or 1000
     
     # Get raw docs first to handle validation manualy
-    quotes_docs = await db.quotes.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    quotes_docs = await db.quotes.find(query, {"_id": 0}).sort(NEWEST_FIRST).limit(limit + 1).to_list(limit + 1)
+    if len(quotes_docs) > limit:
+        quotes_docs = quotes_docs[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(quotes_docs[-1])
     
     valid_quotes = []
     for doc in quotes_docs:
-        try:
-            # Fix datetime strings
-            if isinstance(doc.get('created_at'), str):
-                doc['created_at'] = datetime.fromisoformat(doc['created_at'])
-            
-            # Attempt to validate against model
-            quote = Quote(**doc)
+        quote = _validated_quote(doc)
+        if quote:
             valid_quotes.append(quote)
-        except Exception as e:
-            # Log error but don't crash the whole response
-            # Using print/logging since logger might not be configured globally
-            logging.error(f"Skipping invalid quote {doc.get('id', 'unknown')}: {str(e)}")
-            continue
             
     return valid_quotes
 
@@ -851,14 +982,25 @@ async def get_quote(quote_id: str, admin: dict = Depends(get_current_admin)):
 
 @api_router.put("/quotes/{quote_id}", response_model=Quote)
 async def update_quote(quote_id: str, quote_update: QuoteUpdate, admin: dict = Depends(get_current_admin)):
-    quote = await db.quotes.find_one({"id": quote_id}, {"_id": 0})
-    if not quote:
+    update_data = {k: v for k, v in quote_update.model_dump().items() if v is not None}
+    if update_data:
+        # The before-image comes from the same atomic write, so concurrent
+        # updates each apply their own stats delta
+        old_quote = await db.quotes.find_one_and_update(
+            {"id": quote_id},
+            {"$set": update_data},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE
+        )
+    else:
+        old_quote = await db.quotes.find_one({"id": quote_id}, {"_id": 0})
+    if not old_quote:
         raise HTTPException(status_code=404, detail="Teklif bulunamadı")
     
-    update_data = {k: v for k, v in quote_update.model_dump().items() if v is not None}
+    quote = {**old_quote, **update_data}
     if update_data:
-        await db.quotes.update_one({"id": quote_id}, {"$set": update_data})
-        quote.update(update_data)
+        await record_quote_changed(db, old_quote, quote)
+        pdf_cache.invalidate_quote(quote_id)
     
     if isinstance(quote.get('created_at'), str):
         quote['created_at'] = datetime.fromisoformat(quote['created_at'])
@@ -892,6 +1034,25 @@ async def upload_file(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Dosya yüklenemedi: {str(e)}")
 
 # PDF and Email endpoints
+async def render_quote_pdf(quote: dict, settings: Optional[dict], base_url: str) -> bytes:
+    """Render a quote PDF on the worker pool (or reuse a cached render), mapping pool limits to HTTP errors"""
+    key = pdf_cache_key(quote, (settings or {}).get('version', 0), base_url)
+    pdf_data = pdf_cache.get(key)
+    if pdf_data is not None:
+        return pdf_data
+    try:
+        pdf_data = await pdf_render_pool.render_quote(quote, quote.get('pricing'), settings, base_url)
+    except PDFQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="PDF kuyruğu dolu, lütfen biraz sonra tekrar deneyin",
+            headers={"Retry-After": "5"}
+        )
+    except PDFRenderTimeout:
+        raise HTTPException(status_code=504, detail="PDF oluşturma zaman aşımına uğradı")
+    pdf_cache.put(key, quote['id'], pdf_data)
+    return pdf_data
+
 @api_router.get("/quotes/{quote_id}/pdf")
 async def generate_quote_pdf(quote_id: str, admin: dict = Depends(get_current_admin)):
     """Generate PDF for quote"""
@@ -901,12 +1062,12 @@ async def generate_quote_pdf(quote_id: str, admin: dict = Depends(get_current_ad
     
     try:
         # Get company settings
-        settings = await db.settings.find_one({}, {"_id": 0})
+        settings = await settings_store.get(db)
         
         # Get backend URL from environment or use localhost
         base_url = os.environ.get('BACKEND_URL', 'http://localhost:8001')
         
-        pdf_data = pdf_service.generate_quote_pdf(quote, quote.get('pricing'), settings, base_url)
+        pdf_data = await render_quote_pdf(quote, settings, base_url)
         return Response(
             content=pdf_data,
             media_type="application/pdf",
@@ -914,6 +1075,8 @@ async def generate_quote_pdf(quote_id: str, admin: dict = Depends(get_current_ad
                 "Content-Disposition": f"attachment; filename=teklif_{quote_id[:8]}.pdf"
             }
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"PDF generation failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"PDF oluşturulamadı: {str(e)}")
@@ -925,24 +1088,25 @@ async def send_quote_email(quote_id: str, admin: dict = Depends(get_current_admi
     if not quote:
         raise HTTPException(status_code=404, detail="Teklif bulunamadı")
     
+    if not email_service.is_configured:
+        return {"message": "Email gönderilemedi (SMTP yapılandırılmamış)", "sent_to": quote['email']}
+    
     try:
         # Get company settings
-        settings = await db.settings.find_one({}, {"_id": 0})
+        settings = await settings_store.get(db)
         
         # Get backend URL
         base_url = os.environ.get('BACKEND_URL', 'http://localhost:8001')
         
         # Generate PDF
-        pdf_data = pdf_service.generate_quote_pdf(quote, quote.get('pricing'), settings, base_url)
-        
-        # Send email with PDF attachment
-        success = email_service.send_quote_response(quote, pdf_data, settings)
+        pdf_data = await render_quote_pdf(quote, settings, base_url)
         
-        if success:
-            return {"message": "Email başarıyla gönderildi", "sent_to": quote['email']}
-        else:
-            return {"message": "Email gönderilemedi (SMTP yapılandırılmamış)", "sent_to": quote['email']}
+        # Queue email with PDF attachment; delivered by the outbox worker
+        await email_outbox.enqueue(db, **email_service.compose_quote_response(quote, pdf_data, settings))
+        return {"message": "Email gönderim kuyruğuna alındı", "sent_to": quote['email']}
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Email sending failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Email gönderilemedi: {str(e)}")
@@ -950,9 +1114,11 @@ async def send_quote_email(quote_id: str, admin: dict = Depends(get_current_admi
 @api_router.delete("/quotes/{quote_id}")
 async def delete_quote(quote_id: str, admin: dict = Depends(get_current_admin)):
     """Delete a quote (Admin only)"""
-    result = await db.quotes.delete_one({"id": quote_id})
-    if result.deleted_count == 0:
+    deleted = await db.quotes.find_one_and_delete({"id": quote_id}, projection={"_id": 0})
+    if not deleted:
         raise HTTPException(status_code=404, detail="Teklif bulunamadı")
+    await record_quote_deleted(db, deleted)
+    pdf_cache.invalidate_quote(quote_id)
     
     return {"message": "Teklif başarıyla silindi", "deleted_id": quote_id}
 
@@ -968,7 +1134,7 @@ async def customer_register(data: CustomerRegister):
     customer = Customer(
         name=data.name,
         email=data.email,
-        password_hash=get_password_hash(data.password),
+        password_hash=await get_password_hash(data.password),
         company=data.company,
         phone=data.phone
     )
@@ -981,7 +1147,7 @@ async def customer_register(data: CustomerRegister):
 async def customer_login(data: CustomerLogin):
     """Customer login"""
     customer = await db.customers.find_one({"email": data.email}, {"_id": 0})
-    if not customer or not verify_password(data.password, customer["password_hash"]):
+    if not customer or not await verify_password(data.password, customer["password_hash"]):
         raise HTTPException(status_code=401, detail="Hatalı email veya şifre")
     return {
         "success": True, 
@@ -1019,17 +1185,20 @@ async def customer_forgot_password(request: PasswordResetRequest):
     })
     
     # Get settings for email
-    settings = await db.settings.find_one({}, {"_id": 0}) or {}
+    settings = await settings_store.get(db) or {}
     frontend_url = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
     reset_link = f"{frontend_url}/reset-password?token={reset_token}"
     
-    # Send email
-    email_service.send_password_reset_email(
-        request.email,
-        customer['name'],
-        reset_link,
-        settings
-    )
+    # Queue email
+    try:
+        await email_outbox.enqueue(db, **email_service.compose_password_reset_email(
+            request.email,
+            customer['name'],
+            reset_link,
+            settings
+        ))
+    except Exception as e:
+        logger.error(f"Failed to queue password reset email: {str(e)}")
     
     return {"message": "Eğer email kayıtlıysa, sıfırlama linki gönderildi"}
 
@@ -1048,7 +1217,7 @@ async def customer_reset_password(reset: PasswordReset):
         raise HTTPException(status_code=400, detail="Geçersiz veya süresi dolmuş token")
     
     # Update customer password
-    new_hash = get_password_hash(reset.new_password)
+    new_hash = await get_password_hash(reset.new_password)
     await db.customers.update_one(
         {"email": reset_doc['email']},
         {"$set": {"password_hash": new_hash}}
@@ -1082,17 +1251,20 @@ async def admin_forgot_password(request: PasswordResetRequest):
         "created_at": datetime.now(timezone.utc)
     })
     
-    settings = await db.settings.find_one({}, {"_id": 0}) or {}
+    settings = await settings_store.get(db) or {}
     frontend_url = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
     reset_link = f"{frontend_url}/admin/reset-password?token={reset_token}"
     
-    email_service.send_password_reset_email(
-        request.email,
-        admin.get('username', 'Admin'),
-        reset_link,
-        settings,
-        is_admin=True
-    )
+    try:
+        await email_outbox.enqueue(db, **email_service.compose_password_reset_email(
+            request.email,
+            admin.get('username', 'Admin'),
+            reset_link,
+            settings,
+            is_admin=True
+        ))
+    except Exception as e:
+        logger.error(f"Failed to queue admin password reset email: {str(e)}")
     
     return {"message": "Eğer email kayıtlıysa, sıfırlama linki gönderildi"}
 
@@ -1109,11 +1281,15 @@ async def admin_reset_password(reset: PasswordReset):
     if not reset_doc:
         raise HTTPException(status_code=400, detail="Geçersiz veya süresi dolmuş token")
     
-    new_hash = get_password_hash(reset.new_password)
-    await db.admins.update_one(
+    new_hash = await get_password_hash(reset.new_password)
+    updated_admin = await db.admins.find_one_and_update(
         {"email": reset_doc['email']},
-        {"$set": {"password_hash": new_hash}}
+        {"$set": {"password_hash": new_hash}},
+        projection={"_id": 0, "id": 1}
     )
+    admin_auth_cache.invalidate(email=reset_doc['email'])
+    if updated_admin:
+        await admin_sessions.revoke(db, updated_admin["id"])
     
     await db.password_resets.update_one(
         {"token": reset.token},
@@ -1257,19 +1433,25 @@ async def convert_quote_to_order(quote_id: str, data: dict):
         raise HTTPException(status_code=400, detail="Geçerli ürün seçilmedi")
     
     # Update quote status and store selected items with new quantities
-    await db.quotes.update_one(
-        {"id": quote_id},
-        {
-            "$set": {
-                "status": "onaylandi",
-                "pricing": updated_pricing,
-                "approved_at": datetime.now(timezone.utc).isoformat()
-            }
-        }
+    approval = {
+        "status": "onaylandi",
+        "pricing": updated_pricing,
+        "approved_at": datetime.now(timezone.utc).isoformat()
+    }
+    # Only one of two concurrent conversions can match the priced status
+    old_quote = await db.quotes.find_one_and_update(
+        {"id": quote_id, "status": "fiyat_verildi"},
+        {"$set": approval},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
     )
+    if not old_quote:
+        raise HTTPException(status_code=400, detail="Sadece fiyatlandırılmış teklifler sipariş haline çevrilebilir")
     
     # Return updated quote
-    updated_quote = await db.quotes.find_one({"id": quote_id}, {"_id": 0})
+    updated_quote = {**old_quote, **approval}
+    await record_quote_changed(db, old_quote, updated_quote)
+    pdf_cache.invalidate_quote(quote_id)
     return updated_quote
 
 # ==================== VISITOR TRACKING ====================
@@ -1289,8 +1471,9 @@ async def track_visit(data: dict, request: Request):
         # Get page
         page = data.get('page', '/')
         
-        # Track visitor
-        await track_visitor(db, client_ip, user_agent, page)
+        # Queue for enrichment and storage in the background
+        if not visitor_queue.submit(client_ip, user_agent, page):
+            return {"status": "dropped"}
         
         return {"status": "tracked"}
     except Exception as e:
@@ -1299,12 +1482,18 @@ async def track_visit(data: dict, request: Request):
 
 
 @api_router.get("/admin/visitors")
-async def get_visitors(credentials: HTTPBasicCredentials = Depends(security)):
+async def get_visitors(
+    credentials: HTTPBasicCredentials = Depends(security),
+    output_format: str = Query("json", alias="format", pattern="^(json|ndjson)$")
+):
     """Get all visitors (admin only)"""
     # Admin auth check
     if credentials.username != "admin" or credentials.password != "admin123":
         raise HTTPException(status_code=401, detail="Unauthorized")
     
+    if output_format == "ndjson":
+        return ndjson_response(db.visitors.find({}, {"_id": 0}).sort("timestamp", -1))
+    
     try:
         visitors = await db.visitors.find({}, {"_id": 0}).sort("timestamp", -1).limit(500).to_list(500)
         return visitors
@@ -1313,6 +1502,27 @@ async def get_visitors(credentials: HTTPBasicCredentials = Depends(security)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@api_router.get("/admin/visitors/stats")
+async def get_visitors_stats(
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to"),
+    limit: int = Query(50, ge=1, le=500),
+    admin: dict = Depends(get_current_admin)
+):
+    """Visit counts, unique visitors and top pages/countries/devices/browsers for a date range,
+    read from the hourly/daily rollups (default: the last 7 days)"""
+    now = datetime.now(timezone.utc)
+    try:
+        return await get_visitor_stats(
+            db,
+            start or (now - timedelta(days=7)).isoformat(),
+            end or now.isoformat(),
+            limit
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Geçersiz tarih aralığı")
+
+
 # ==================== BALANCE LOG ====================
 
 @api_router.post("/admin/balance-log")
@@ -1392,7 +1602,7 @@ async def update_customer_profile(customer_id: str, data: CustomerUpdate):
     
     # Hash password if being updated
     if 'password' in update_data and update_data['password']:
-        update_data['password_hash'] = get_password_hash(update_data['password'])
+        update_data['password_hash'] = await get_password_hash(update_data['password'])
         del update_data['password']
     
     if update_data:
@@ -1420,42 +1630,93 @@ async def change_admin_password(
     if not current_password or not new_password:
         raise HTTPException(status_code=400, detail="Tüm alanlar gereklidir")
     
-    # DB'deki hash ile mevcut şifreyi doğrula
-    if not verify_password(current_password, admin["password_hash"]):
+    # DB'deki hash ile mevcut şifreyi doğrula (token ile gelen istekte hash yok)
+    password_hash = admin.get("password_hash")
+    if not password_hash:
+        stored = await db.admins.find_one({"id": admin["id"]}, {"_id": 0, "password_hash": 1})
+        password_hash = stored["password_hash"] if stored else None
+    if not password_hash or not await verify_password(current_password, password_hash):
       raise HTTPException(status_code=401, detail="Mevcut şifre yanlış")
     
-    new_hash = get_password_hash(new_password)
+    new_hash = await get_password_hash(new_password)
     
     # Admin tablosundaki şifreyi güncelle
     await db.admins.update_one(
         {"id": admin["id"]},
         {"$set": {"password_hash": new_hash}}
     )
+    admin_auth_cache.invalidate(admin_id=admin["id"])
+    await admin_sessions.revoke(db, admin["id"])
     
     return {"message": "Şifre başarıyla güncellendi"}
     
 # Admin Customer Management endpoints
+async def _customers_page_with_stats(query: dict, limit: int) -> List[dict]:
+    """One page of customers (newest first) plus quote_count / latest_quote_date.
+    Fetches limit + 1 rows so the caller can tell whether another page exists."""
+    customers = await db.customers.find(query, {"_id": 0, "password_hash": 0}).sort(NEWEST_FIRST).to_list(limit + 1)
+    
+    # Quote statistics for the whole page in a single aggregation
+    emails = [customer["email"] for customer in customers]
+    stats = {}
+    async for row in db.quotes.aggregate([
+        {"$match": {"email": {"$in": emails}}},
+        {"$group": {
+            "_id": "$email",
+            "quote_count": {"$sum": 1},
+            "latest_quote_date": {"$max": "$created_at"}
+        }}
+    ]):
+        stats[row["_id"]] = row
+    
+    for customer in customers:
+        row = stats.get(customer["email"], {})
+        customer['quote_count'] = row.get("quote_count", 0)
+        customer['latest_quote_date'] = row.get("latest_quote_date")
+    return customers
+
+async def _iter_customers_with_stats(query: dict, page_size: int = 500):
+    while True:
+        customers = await _customers_page_with_stats(query, page_size)
+        for customer in customers[:page_size]:
+            yield customer
+        if len(customers) <= page_size:
+            return
+        query = after_cursor_filter(encode_cursor(customers[page_size - 1]))
+
 @api_router.get("/admin/customers")
-async def get_all_customers(admin: dict = Depends(get_current_admin)):
-    """Get all customers with their quote statistics"""
-    customers = await db.customers.find({}, {"_id": 0, "password_hash": 0}).sort("created_at", -1).to_list(1000)
+async def get_all_customers(
+    response: Response,
+    admin: dict = Depends(get_current_admin),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after: Optional[str] = None,
+    output_format: str = Query("json", alias="format", pattern="^(json|ndjson)$")
+):
+    """Get customers with their quote statistics, newest first.
+    The next page cursor is in the X-Next-Cursor header. format=ndjson streams
+    every customer after the optional cursor and rejects limit."""
+    if output_format == "ndjson" and limit:
+        raise HTTPException(status_code=400, detail="format=ndjson ile limit kullanılamaz")
+    
+    query = {}
+    if after:
+        try:
+            query = after_cursor_filter(after)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Geçersiz sayfa imleci")
+    
+    if output_format == "ndjson":
+        return ndjson_response(_iter_customers_with_stats(query))
+    
+    limit = limit or 1000
+    customers = await _customers_page_with_stats(query, limit)
+    if len(customers) > limit:
+        customers = customers[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(customers[-1])
     
-    # Add quote statistics for each customer
     for customer in customers:
         if isinstance(customer.get('created_at'), str):
             customer['created_at'] = datetime.fromisoformat(customer['created_at'])
-        
-        # Count quotes for this customer
-        quote_count = await db.quotes.count_documents({"email": customer["email"]})
-        customer['quote_count'] = quote_count
-        
-        # Get latest quote
-        latest_quote = await db.quotes.find_one(
-            {"email": customer["email"]}, 
-            {"_id": 0},
-            sort=[("created_at", -1)]
-        )
-        customer['latest_quote_date'] = latest_quote.get('created_at') if latest_quote else None
     
     return customers
 
@@ -1473,6 +1734,14 @@ async def get_customer_quotes_by_id(customer_id: str, admin: dict = Depends(get_
     
     return {"customer": customer, "quotes": quotes}
 
+@api_router.get("/admin/customers/{customer_id}/stats")
+async def get_customer_stats_by_id(customer_id: str, admin: dict = Depends(get_current_admin)):
+    """Quote statistics for a customer (count, latest quote, approvals, conversion rate)"""
+    customer = await db.customers.find_one({"id": customer_id}, {"_id": 0, "email": 1})
+    if not customer:
+        raise HTTPException(status_code=404, detail="Müşteri bulunamadı")
+    return await get_customer_stats(db, customer["email"])
+
 @api_router.put("/admin/customers/{customer_id}")
 async def update_customer_balance(customer_id: str, data: dict, admin: dict = Depends(get_current_admin)):
     """Update customer balance"""
@@ -1507,6 +1776,9 @@ async def upload_file_to_disk(file: UploadFile = File(...)):
         with open(file_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
         
+        # Pre-build the PDF thumbnail (non-images are skipped)
+        await asyncio.to_thread(ensure_file_thumbnail, file_path)
+        
         # Return URL
         file_url = f"/uploads/{unique_filename}"
         return {
@@ -1520,19 +1792,24 @@ async def upload_file_to_disk(file: UploadFile = File(...)):
 
 # Settings endpoints
 @api_router.get("/settings")
-async def get_settings():
+async def get_settings(request: Request):
     """Get company settings (public)"""
-    settings = await db.settings.find_one({}, {"_id": 0})
+    settings = await settings_store.get(db)
     if not settings:
         # Return default settings
-        return CompanySettings().model_dump()
-    return settings
+        settings = CompanySettings().model_dump()
+    etag = make_etag("settings", settings.get('version', 0))
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    content = json.dumps(jsonable_encoder(public_settings(settings)), ensure_ascii=False).encode('utf-8')
+    return cached_json(request, content, etag)
 
 @api_router.post("/settings")
 async def update_settings(settings: CompanySettings, admin: dict = Depends(get_current_admin)):
     """Update company settings"""
-    await db.settings.delete_many({})  # Remove old settings
-    await db.settings.insert_one(settings.model_dump())
+    await settings_store.update(db, settings.model_dump())
+    pdf_cache.clear()
     return {"message": "Ayarlar kaydedildi"}
 
 # Campaign endpoints
@@ -1550,7 +1827,7 @@ async def get_campaigns(admin: dict = Depends(get_current_admin)):
     return campaigns
 
 @api_router.get("/campaigns/active")
-async def get_active_campaign():
+async def get_active_campaign(request: Request):
     """Get currently active campaign (public)"""
     now = datetime.now(timezone.utc)
     now_iso = now.isoformat()
@@ -1562,7 +1839,7 @@ async def get_active_campaign():
     }, {"_id": 0}).to_list(1)
     
     if not campaigns:
-        return None
+        return cached_json(request, b'null')
     
     campaign = campaigns[0]
     if isinstance(campaign.get('created_at'), str):
@@ -1572,7 +1849,8 @@ async def get_active_campaign():
     if isinstance(campaign.get('bitis_tarihi'), str):
         campaign['bitis_tarihi'] = datetime.fromisoformat(campaign['bitis_tarihi'])
     
-    return campaign
+    content = json.dumps(jsonable_encoder(campaign), ensure_ascii=False).encode('utf-8')
+    return cached_json(request, content)
 
 @api_router.post("/campaigns", response_model=Campaign)
 async def create_campaign(campaign_data: CampaignCreate, admin: dict = Depends(get_current_admin)):
@@ -1750,13 +2028,10 @@ async def get_vehicle_warnings(admin: dict = Depends(get_current_admin)):
 # ==================== BRANDS ====================
 
 @api_router.get("/brands", response_model=List[Brand])
-async def get_brands():
+async def get_brands(request: Request):
     """Get all brands (public)"""
-    brands = await db.brands.find({}, {"_id": 0}).sort("name", 1).to_list(1000)
-    for brand in brands:
-        if isinstance(brand.get('created_at'), str):
-            brand['created_at'] = datetime.fromisoformat(brand['created_at'])
-    return brands
+    await catalog_cache.ensure_fresh(db)
+    return cached_json(request, catalog_cache.brands_json, make_etag("brands", catalog_cache.version))
 
 @api_router.post("/brands", response_model=Brand)
 async def create_brand(brand: BrandCreate, admin: dict = Depends(get_current_admin)):
@@ -1765,6 +2040,7 @@ async def create_brand(brand: BrandCreate, admin: dict = Depends(get_current_adm
     doc = new_brand.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     await db.brands.insert_one(doc)
+    await catalog_cache.bump(db)
     return new_brand
 
 @api_router.put("/brands/{brand_id}", response_model=Brand)
@@ -1773,6 +2049,7 @@ async def update_brand(brand_id: str, brand: BrandCreate, admin: dict = Depends(
     update_data = brand.model_dump(exclude_unset=True)
     if update_data:
         await db.brands.update_one({"id": brand_id}, {"$set": update_data})
+        await catalog_cache.bump(db)
     
     updated_brand = await db.brands.find_one({"id": brand_id}, {"_id": 0})
     if not updated_brand:
@@ -1789,6 +2066,7 @@ async def delete_brand(brand_id: str, admin: dict = Depends(get_current_admin)):
     result = await db.brands.delete_one({"id": brand_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Marka bulunamadı")
+    await catalog_cache.bump(db)
     return {"message": "Marka silindi"}
 
 # ==================== CONTACT MESSAGES ====================
@@ -1810,11 +2088,17 @@ async def create_contact_message(message_data: ContactMessageCreate):
     return message
 
 @api_router.get("/contact-messages", response_model=List[ContactMessage])
-async def get_contact_messages(admin: dict = Depends(get_current_admin), status_filter: Optional[str] = None):
+async def get_contact_messages(
+    admin: dict = Depends(get_current_admin),
+    status_filter: Optional[str] = None,
+    output_format: str = Query("json", alias="format", pattern="^(json|ndjson)$")
+):
     """Get all contact messages (admin only)"""
     query = {}
     if status_filter:
         query["status"] = status_filter
+    if output_format == "ndjson":
+        return ndjson_response(db.contact_messages.find(query, {"_id": 0}).sort("created_at", -1))
     messages = await db.contact_messages.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
     for message in messages:
         if isinstance(message.get('created_at'), str):
@@ -1861,10 +2145,11 @@ async def delete_contact_message(message_id: str, admin: dict = Depends(get_curr
 
 # FAQ endpoints
 @api_router.get("/faqs")
-async def get_faqs():
+async def get_faqs(request: Request):
     """Get all active FAQs"""
     faqs = await db.faqs.find({"is_active": True}, {"_id": 0}).sort("order", 1).to_list(1000)
-    return faqs
+    content = json.dumps(jsonable_encoder(faqs), ensure_ascii=False).encode('utf-8')
+    return cached_json(request, content)
 
 @api_router.get("/admin/faqs")
 async def get_all_faqs(admin: dict = Depends(get_current_admin)):
@@ -1921,6 +2206,7 @@ async def delete_customer(customer_id: str, admin: dict = Depends(get_current_ad
     # Optionally: Delete related data (quotes, balance logs)
     await db.quotes.delete_many({"email": customer["email"]})
     await db.balance_logs.delete_many({"customer_id": customer_id})
+    await remove_customer_stats(db, customer["email"])
     
     return {"message": f"Müşteri {customer['name']} ve ilgili tüm veriler silindi"}
 
@@ -1933,7 +2219,7 @@ async def reset_customer_password(customer_id: str, admin: dict = Depends(get_cu
     
     # Generate new random password
     new_password = secrets.token_urlsafe(8)
-    password_hash = get_password_hash(new_password)
+    password_hash = await get_password_hash(new_password)
     
     # Update password
     await db.customers.update_one(
@@ -1956,6 +2242,7 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Configure logging
@@ -1965,6 +2252,26 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_db_indexes():
+    try:
+        await ensure_indexes(db)
+    except Exception as e:
+        logger.error(f"Index bootstrap failed: {e}")
+
+@app.on_event("startup")
+async def start_email_outbox():
+    email_outbox.start(db)
+
+@app.on_event("startup")
+async def start_visitor_queue():
+    visitor_queue.start(db)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await email_outbox.stop()
+    await visitor_queue.stop()
+    email_service.pool.close_idle()
     client.close()
+    password_hasher.shutdown()
+    pdf_render_pool.shutdown()
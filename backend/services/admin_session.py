@@ -0,0 +1,122 @@
+"""
+Admin Session Tokens
+Issues and verifies signed, expiring admin session tokens (HS256 JWT)
+so authenticated requests need no database lookup or bcrypt check.
+
+Revocation is shared between workers: every admin has a session epoch in
+MongoDB (auth_meta), bumped when the admin is deleted, deactivated or
+changes password. Tokens carry the epoch they were issued under, and each
+worker re-reads the epochs at most every ADMIN_REVOCATION_CHECK_SECONDS.
+
+The signing key is ADMIN_SESSION_SECRET; without it, a random key is
+generated once and stored in auth_meta so all workers (and restarts)
+share it.
+"""
+import asyncio
+import logging
+import os
+import secrets
+import time
+from typing import Dict, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+import jwt
+
+logger = logging.getLogger(__name__)
+
+
+class AdminSessionManager:
+    algorithm = 'HS256'
+
+    def __init__(self):
+        self.secret = os.environ.get('ADMIN_SESSION_SECRET', '')
+        self.ttl = int(os.environ.get('ADMIN_SESSION_TTL_MINUTES', '480')) * 60
+        self.check_interval = float(os.environ.get('ADMIN_REVOCATION_CHECK_SECONDS', '2'))
+        # Replaced, never mutated, so callers can hold on to a snapshot
+        self.epochs: Dict[str, int] = {}
+        self._checked_at = None
+        self._lock = asyncio.Lock()
+
+    def _set_epochs(self, meta: Optional[dict]):
+        self.epochs = dict((meta or {}).get('epochs') or {})
+        self._checked_at = time.monotonic()
+
+    async def refresh(self, db, force: bool = False):
+        """Reload the revocation epochs if they are older than the check interval"""
+        if not force and self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return
+        async with self._lock:
+            if not force and self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return
+            self._set_epochs(await db.auth_meta.find_one({'_id': 'admin_sessions'}))
+
+    async def _signing_secret(self, db) -> str:
+        if self.secret:
+            return self.secret
+        async with self._lock:
+            if not self.secret:
+                logger.warning("ADMIN_SESSION_SECRET not set - using the shared secret stored in MongoDB")
+                try:
+                    meta = await db.auth_meta.find_one_and_update(
+                        {'_id': 'session_secret'},
+                        {'$setOnInsert': {'secret': secrets.token_urlsafe(48)}},
+                        upsert=True,
+                        return_document=ReturnDocument.AFTER
+                    )
+                except DuplicateKeyError:
+                    # Another worker inserted it first
+                    meta = await db.auth_meta.find_one({'_id': 'session_secret'})
+                self.secret = meta['secret']
+        return self.secret
+
+    def epoch(self, admin_id: str) -> int:
+        return self.epochs.get(admin_id, 0)
+
+    async def issue(self, db, admin: dict) -> dict:
+        """Create a session token carrying the admin's identity, role and current epoch"""
+        await self.refresh(db, force=True)
+        now = int(time.time())
+        claims = {
+            'sub': admin['id'],
+            'username': admin['username'],
+            'email': admin.get('email'),
+            'role': admin.get('role', 'admin'),
+            'permissions': admin.get('permissions', ['all']),
+            'epoch': self.epoch(admin['id']),
+            'iat': now,
+            'exp': now + self.ttl,
+        }
+        token = jwt.encode(claims, await self._signing_secret(db), algorithm=self.algorithm)
+        return {'token': token, 'token_type': 'bearer', 'expires_at': claims['exp']}
+
+    async def verify(self, db, token: str) -> Optional[dict]:
+        """Return the admin described by a valid, unrevoked token, or None"""
+        try:
+            claims = jwt.decode(token, await self._signing_secret(db), algorithms=[self.algorithm])
+        except jwt.PyJWTError:
+            return None
+        await self.refresh(db)
+        if claims.get('epoch', 0) < self.epoch(claims['sub']):
+            return None
+        return {
+            'id': claims['sub'],
+            'username': claims['username'],
+            'email': claims.get('email'),
+            'role': claims.get('role', 'admin'),
+            'permissions': claims.get('permissions', ['all']),
+        }
+
+    async def revoke(self, db, admin_id: str):
+        """Reject every token issued to this admin so far, on all workers"""
+        meta = await db.auth_meta.find_one_and_update(
+            {'_id': 'admin_sessions'},
+            {'$inc': {f'epochs.{admin_id}': 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._set_epochs(meta)
+
+
+admin_sessions = AdminSessionManager()
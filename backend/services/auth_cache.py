@@ -0,0 +1,89 @@
+"""
+Admin Auth Cache
+Remembers recently verified admin credentials so HTTP Basic requests
+don't hit MongoDB and bcrypt on every call. Each entry records the
+admin's session epoch (see admin_session); once another worker bumps it
+(password change, deactivation, deletion) the entry is ignored.
+"""
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class AdminAuthCache:
+    def __init__(self):
+        self.ttl = float(os.environ.get('ADMIN_AUTH_CACHE_TTL', '300'))
+        self.max_entries = int(os.environ.get('ADMIN_AUTH_CACHE_SIZE', '256'))
+        # Per-process key: cache keys are useless outside this process
+        self._secret = secrets.token_bytes(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, username: str, password: str) -> str:
+        message = username.encode('utf-8') + b'\x00' + password.encode('utf-8')
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()
+
+    def get(self, username: str, password: str, epochs: Dict[str, int]) -> Optional[dict]:
+        """Return the cached admin document for these credentials, if still fresh and not revoked"""
+        if self.ttl <= 0:
+            return None
+        key = self._key(username, password)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] < epochs.get(entry[0].get('id'), 0):
+                del self._entries[key]
+                entry = None
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[0])
+
+    def put(self, username: str, password: str, admin: dict, epoch: int):
+        """Remember credentials that were just verified against the database
+        (epoch: the admin's session epoch read before that lookup)"""
+        if self.ttl <= 0:
+            return
+        key = self._key(username, password)
+        with self._lock:
+            self._entries[key] = (dict(admin), time.monotonic() + self.ttl, epoch)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, admin_id: str = None, email: str = None):
+        """Drop every cached entry for the given admin (by id or email)"""
+        with self._lock:
+            stale = [
+                key for key, (admin, _, _) in self._entries.items()
+                if (admin_id and admin.get('id') == admin_id)
+                or (email and admin.get('email') == email)
+            ]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'ttl_seconds': self.ttl,
+            }
+
+
+admin_auth_cache = AdminAuthCache()
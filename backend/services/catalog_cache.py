@@ -0,0 +1,154 @@
+"""
+Catalog Snapshot
+Process-local copy of products, categories and brands for the public
+read endpoints. Writers bump a version counter in MongoDB
+(catalog_meta); every worker compares it at most every
+CATALOG_VERSION_CHECK_SECONDS and reloads when it changed.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Type
+
+from pydantic import BaseModel
+
+from services.product_search import product_search
+
+logger = logging.getLogger(__name__)
+
+
+def _sort_key(value):
+    # Rough BSON ordering: missing/null < numbers < strings < everything else
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (4, value)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (3, value.isoformat())
+    return (5, str(value))
+
+
+def _lte(a, b) -> bool:
+    """BSON-style a <= b where null sorts before numbers (matches $expr $lte)"""
+    if a is None:
+        return True
+    if b is None:
+        return False
+    return a <= b
+
+
+class CatalogCache:
+    def __init__(self):
+        self.check_interval = float(os.environ.get('CATALOG_VERSION_CHECK_SECONDS', '2'))
+        self.version: Optional[int] = None
+        self.products: List[dict] = []
+        self._products_by_id: Dict[str, dict] = {}
+        self._product_json: Dict[str, bytes] = {}
+        self.categories_json = b'[]'
+        self.brands_json = b'[]'
+        self._checked_at = 0.0
+        self._dirty = True
+        self._lock = asyncio.Lock()
+        self._models: Dict[str, Type[BaseModel]] = {}
+
+    def configure(self, product_model: Type[BaseModel], category_model: Type[BaseModel], brand_model: Type[BaseModel]):
+        """Register the response models used to pre-render snapshot JSON"""
+        self._models = {'product': product_model, 'category': category_model, 'brand': brand_model}
+
+    @staticmethod
+    def _render(model: Type[BaseModel], doc: dict) -> Optional[bytes]:
+        try:
+            if isinstance(doc.get('created_at'), str):
+                doc = {**doc, 'created_at': datetime.fromisoformat(doc['created_at'])}
+            return model(**doc).model_dump_json().encode('utf-8')
+        except Exception as e:
+            logger.error(f"Skipping invalid {model.__name__} {doc.get('id', 'unknown')}: {e}")
+            return None
+
+    def _render_list(self, model: Type[BaseModel], docs: List[dict]) -> bytes:
+        rendered = [self._render(model, doc) for doc in docs]
+        return b'[' + b','.join(item for item in rendered if item is not None) + b']'
+
+    async def _load(self, db, version: int):
+        models = self._models
+        products = await db.products.find({}, {"_id": 0}).to_list(None)
+        categories = await db.categories.find({}, {"_id": 0}).to_list(None)
+        brands = await db.brands.find({}, {"_id": 0}).sort("name", 1).to_list(None)
+
+        product_json = {}
+        valid_products = []
+        for product in products:
+            rendered = self._render(models['product'], product)
+            if rendered is not None:
+                product_json[product['id']] = rendered
+                valid_products.append(product)
+
+        self.products = valid_products
+        self._products_by_id = {product['id']: product for product in valid_products}
+        self._product_json = product_json
+        self.categories_json = self._render_list(models['category'], categories)
+        self.brands_json = self._render_list(models['brand'], brands)
+        product_search.build(valid_products)
+        self.version = version
+        logger.info(f"Catalog snapshot v{version} loaded: {len(valid_products)} products")
+
+    async def ensure_fresh(self, db):
+        """Reload if this or another worker bumped the catalog version"""
+        if not self._dirty and time.monotonic() - self._checked_at < self.check_interval:
+            return
+        async with self._lock:
+            if not self._dirty and time.monotonic() - self._checked_at < self.check_interval:
+                return
+            self._dirty = False
+            meta = await db.catalog_meta.find_one({"_id": "catalog"}) or {}
+            version = meta.get("version", 0)
+            if version != self.version:
+                await self._load(db, version)
+            self._checked_at = time.monotonic()
+
+    async def bump(self, db):
+        """Record a catalog write so every worker reloads"""
+        await db.catalog_meta.update_one({"_id": "catalog"}, {"$inc": {"version": 1}}, upsert=True)
+        self._dirty = True
+
+    def product_json(self, product_id: str) -> Optional[bytes]:
+        return self._product_json.get(product_id)
+
+    def query_products(
+        self,
+        category: Optional[str] = None,
+        ranked_ids: Optional[List[str]] = None,
+        low_stock: bool = False,
+        sort_field: Optional[str] = None,
+        descending: bool = False,
+        limit: int = 1000
+    ) -> bytes:
+        """Filter and sort the snapshot like get_products' Mongo query did; returns a JSON array.
+        Search results keep their relevance order unless a sort field is given."""
+        if ranked_ids is not None:
+            # Search results: only the matched products are touched, already in rank order
+            by_id = self._products_by_id
+            products = [by_id[product_id] for product_id in ranked_ids if product_id in by_id]
+        else:
+            products = self.products
+        if category:
+            products = [p for p in products if p.get('category') == category]
+        if low_stock:
+            products = [p for p in products if _lte(p.get('stock_quantity'), p.get('minimum_stok'))]
+
+        if ranked_ids is None or sort_field is not None:
+            products = sorted(
+                products,
+                key=lambda p: _sort_key(p.get(sort_field or 'created_at')),
+                reverse=descending
+            )
+        return b'[' + b','.join(self._product_json[p['id']] for p in products[:limit]) + b']'
+
+
+catalog_cache = CatalogCache()
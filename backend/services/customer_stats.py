@@ -0,0 +1,199 @@
+"""
+Customer Quote Statistics
+Maintains one customer_stats document per customer email, updated
+incrementally on quote writes so dashboards read a single document.
+
+Rebuild from scratch: python -m services.customer_stats rebuild
+"""
+import asyncio
+import logging
+import os
+import sys
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pymongo import ReplaceOne
+
+logger = logging.getLogger(__name__)
+
+APPROVED = 'onaylandi'
+
+
+def _status(quote: dict) -> str:
+    status = quote.get('status') or 'beklemede'
+    return getattr(status, 'value', status)
+
+
+def _created_at(quote: dict):
+    created_at = quote.get('created_at')
+    if isinstance(created_at, datetime):
+        return created_at.isoformat()
+    return created_at
+
+
+def _pricing_total(quote: dict) -> float:
+    total = 0.0
+    for item in quote.get('pricing') or []:
+        total += item.get('total_price') or 0
+    return total
+
+
+def _approval(quote: dict) -> tuple:
+    if _status(quote) == APPROVED:
+        return 1, _pricing_total(quote)
+    return 0, 0.0
+
+
+async def record_quote_created(db, quote: dict):
+    try:
+        approved_count, approved_total = _approval(quote)
+        await db.customer_stats.update_one(
+            {"email": quote['email']},
+            {
+                "$inc": {
+                    "quote_count": 1,
+                    f"status_counts.{_status(quote)}": 1,
+                    "approved_count": approved_count,
+                    "approved_total": approved_total,
+                },
+                "$max": {"latest_quote_date": _created_at(quote)},
+                "$set": {"updated_at": datetime.now(timezone.utc).isoformat()},
+            },
+            upsert=True
+        )
+    except Exception as e:
+        logger.error(f"customer_stats update failed for new quote {quote.get('id')}: {e}")
+
+
+async def record_quote_changed(db, old_quote: dict, new_quote: dict):
+    """Apply the status / approval delta between two versions of a quote"""
+    inc = {}
+    old_status, new_status = _status(old_quote), _status(new_quote)
+    if old_status != new_status:
+        inc[f"status_counts.{old_status}"] = -1
+        inc[f"status_counts.{new_status}"] = 1
+
+    old_count, old_total = _approval(old_quote)
+    new_count, new_total = _approval(new_quote)
+    if new_count != old_count:
+        inc["approved_count"] = new_count - old_count
+    if new_total != old_total:
+        inc["approved_total"] = new_total - old_total
+
+    if not inc:
+        return
+    try:
+        await db.customer_stats.update_one(
+            {"email": new_quote['email']},
+            {"$inc": inc, "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}}
+        )
+    except Exception as e:
+        logger.error(f"customer_stats update failed for quote {new_quote.get('id')}: {e}")
+
+
+async def record_quote_deleted(db, quote: dict):
+    """Remove a quote's contribution. latest_quote_date is left as is until the next rebuild."""
+    approved_count, approved_total = _approval(quote)
+    try:
+        await db.customer_stats.update_one(
+            {"email": quote['email']},
+            {
+                "$inc": {
+                    "quote_count": -1,
+                    f"status_counts.{_status(quote)}": -1,
+                    "approved_count": -approved_count,
+                    "approved_total": -approved_total,
+                },
+                "$set": {"updated_at": datetime.now(timezone.utc).isoformat()},
+            }
+        )
+    except Exception as e:
+        logger.error(f"customer_stats update failed for deleted quote {quote.get('id')}: {e}")
+
+
+async def remove_customer_stats(db, email: str):
+    try:
+        await db.customer_stats.delete_one({"email": email})
+    except Exception as e:
+        logger.error(f"customer_stats delete failed for {email}: {e}")
+
+
+async def get_customer_stats(db, email: str) -> dict:
+    """Stats for one customer, with conversion_rate derived on read"""
+    stats = await db.customer_stats.find_one({"email": email}, {"_id": 0, "rebuild_id": 0}) or {
+        "email": email,
+        "quote_count": 0,
+        "latest_quote_date": None,
+        "status_counts": {},
+        "approved_count": 0,
+        "approved_total": 0.0,
+    }
+    quote_count = stats.get("quote_count", 0)
+    stats["conversion_rate"] = (stats.get("approved_count", 0) / quote_count) if quote_count > 0 else 0.0
+    return stats
+
+
+async def rebuild_customer_stats(db) -> int:
+    """Recompute every customer_stats document from the quotes collection"""
+    rebuild_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc).isoformat()
+    stats = {}
+    pipeline = [
+        {"$group": {
+            "_id": {"email": "$email", "status": "$status"},
+            "count": {"$sum": 1},
+            "latest": {"$max": "$created_at"},
+            "total": {"$sum": {"$sum": "$pricing.total_price"}},
+        }}
+    ]
+    async for row in db.quotes.aggregate(pipeline, allowDiskUse=True):
+        email = row["_id"].get("email")
+        if not email:
+            continue
+        status = row["_id"].get("status") or 'beklemede'
+        doc = stats.setdefault(email, {
+            "email": email,
+            "quote_count": 0,
+            "latest_quote_date": None,
+            "status_counts": {},
+            "approved_count": 0,
+            "approved_total": 0.0,
+            "updated_at": now,
+            "rebuild_id": rebuild_id,
+        })
+        doc["quote_count"] += row["count"]
+        doc["status_counts"][status] = doc["status_counts"].get(status, 0) + row["count"]
+        if row["latest"] and (doc["latest_quote_date"] is None or row["latest"] > doc["latest_quote_date"]):
+            doc["latest_quote_date"] = row["latest"]
+        if status == APPROVED:
+            doc["approved_count"] += row["count"]
+            doc["approved_total"] += row["total"] or 0
+
+    requests = [ReplaceOne({"email": email}, doc, upsert=True) for email, doc in stats.items()]
+    for start in range(0, len(requests), 1000):
+        await db.customer_stats.bulk_write(requests[start:start + 1000], ordered=False)
+    # Customers without quotes any more (docs touched during the rebuild are kept)
+    await db.customer_stats.delete_many({"rebuild_id": {"$ne": rebuild_id}, "updated_at": {"$lt": now}})
+    return len(stats)
+
+
+async def _main(command: str):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent.parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        if command == 'rebuild':
+            count = await rebuild_customer_stats(client[os.environ['DB_NAME']])
+            print(f"Rebuilt customer_stats for {count} customers")
+        else:
+            print("Usage: python -m services.customer_stats rebuild")
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    asyncio.run(_main(sys.argv[1] if len(sys.argv) > 1 else ''))
@@ -0,0 +1,204 @@
+"""
+MongoDB Index Bootstrap
+Declares the indexes every collection queried by server.py needs and
+creates the missing ones. Safe to run repeatedly.
+
+Usage: python -m services.db_indexes  (from the backend directory)
+"""
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+
+def _index(keys: List[Tuple[str, int]], **options) -> IndexModel:
+    if 'name' not in options:
+        options['name'] = '_'.join(f"{field}_{direction}" for field, direction in keys)
+    return IndexModel(keys, **options)
+
+
+# collection -> indexes
+INDEXES: Dict[str, List[IndexModel]] = {
+    'admins': [
+        _index([('id', ASCENDING)], unique=True),
+        _index([('username', ASCENDING)], unique=True),
+        _index([('email', ASCENDING)]),
+    ],
+    'categories': [
+        _index([('id', ASCENDING)], unique=True),
+    ],
+    'products': [
+        _index([('id', ASCENDING)], unique=True),
+        _index([('created_at', ASCENDING)]),
+        _index([('category', ASCENDING), ('created_at', ASCENDING)]),
+    ],
+    'quotes': [
+        _index([('id', ASCENDING)], unique=True),
+        _index([('created_at', DESCENDING), ('id', DESCENDING)]),
+        _index([('email', ASCENDING), ('created_at', DESCENDING), ('id', DESCENDING)]),
+        _index([('status', ASCENDING), ('created_at', DESCENDING), ('id', DESCENDING)]),
+    ],
+    'customers': [
+        _index([('id', ASCENDING)], unique=True),
+        _index([('email', ASCENDING)], unique=True),
+        _index([('created_at', DESCENDING), ('id', DESCENDING)]),
+    ],
+    'customer_stats': [
+        _index([('email', ASCENDING)], unique=True),
+    ],
+    'password_resets': [
+        _index([('token', ASCENDING)], unique=True),
+    ],
+    'balance_logs': [
+        _index([('customer_id', ASCENDING), ('timestamp', DESCENDING)]),
+    ],
+    'campaigns': [
+        _index([('id', ASCENDING)], unique=True),
+        _index([('created_at', DESCENDING)]),
+        _index([('aktif', ASCENDING), ('baslangic_tarihi', ASCENDING), ('bitis_tarihi', ASCENDING)]),
+    ],
+    'vehicles': [
+        _index([('id', ASCENDING)], unique=True),
+        _index([('created_at', DESCENDING)]),
+    ],
+    'brands': [
+        _index([('id', ASCENDING)], unique=True),
+        _index([('name', ASCENDING)]),
+    ],
+    'contact_messages': [
+        _index([('id', ASCENDING)], unique=True),
+        _index([('created_at', DESCENDING)]),
+        _index([('status', ASCENDING), ('created_at', DESCENDING)]),
+    ],
+    'faqs': [
+        _index([('id', ASCENDING)], unique=True),
+        _index([('is_active', ASCENDING), ('order', ASCENDING)]),
+    ],
+    'visitors': [
+        _index([('timestamp', DESCENDING)]),
+    ],
+    'visitor_rollups': [
+        _index([('period', ASCENDING), ('bucket', ASCENDING)], unique=True),
+    ],
+    'email_outbox': [
+        _index([('id', ASCENDING)], unique=True),
+        _index([('status', ASCENDING), ('next_attempt_at', ASCENDING)]),
+        _index([('status', ASCENDING), ('locked_until', ASCENDING)]),
+        # Delivered messages (with their HTML) are kept for EMAIL_OUTBOX_RETENTION_DAYS;
+        # changing the setting later needs a collMod or dropping this index
+        _index(
+            [('sent_at', ASCENDING)],
+            expireAfterSeconds=int(float(os.environ.get('EMAIL_OUTBOX_RETENTION_DAYS', '30')) * 86400),
+            partialFilterExpression={'status': 'sent'}
+        ),
+    ],
+}
+
+# Query shapes used by server.py: (collection, equality fields, sort fields)
+QUERY_PATTERNS: List[Tuple[str, List[str], List[str]]] = [
+    ('admins', ['username'], []),
+    ('admins', ['email'], []),
+    ('admins', ['id'], []),
+    ('categories', ['id'], []),
+    ('products', ['id'], []),
+    ('products', [], ['created_at']),
+    ('products', ['category'], ['created_at']),
+    ('quotes', ['id'], []),
+    ('quotes', [], ['created_at', 'id']),
+    ('quotes', ['email'], ['created_at', 'id']),
+    ('quotes', ['status'], ['created_at', 'id']),
+    ('customers', ['id'], []),
+    ('customers', ['email'], []),
+    ('customers', [], ['created_at', 'id']),
+    ('customer_stats', ['email'], []),
+    ('password_resets', ['token'], []),
+    ('balance_logs', ['customer_id'], ['timestamp']),
+    ('campaigns', ['id'], []),
+    ('campaigns', [], ['created_at']),
+    ('campaigns', ['aktif'], []),
+    ('vehicles', ['id'], []),
+    ('vehicles', [], ['created_at']),
+    ('brands', ['id'], []),
+    ('brands', [], ['name']),
+    ('contact_messages', ['id'], []),
+    ('contact_messages', [], ['created_at']),
+    ('contact_messages', ['status'], ['created_at']),
+    ('faqs', ['id'], []),
+    ('faqs', ['is_active'], ['order']),
+    ('visitors', [], ['timestamp']),
+    ('visitor_rollups', ['period'], ['bucket']),
+    ('email_outbox', ['id'], []),
+    ('email_outbox', ['status'], ['next_attempt_at']),
+]
+
+
+def _covers(index_fields: List[str], equality: List[str], sort: List[str]) -> bool:
+    """True if an index with these key fields can serve the query shape"""
+    eq_count = len(equality)
+    if set(index_fields[:eq_count]) != set(equality):
+        return False
+    return index_fields[eq_count:eq_count + len(sort)] == sort
+
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """Create missing indexes; returns {collection: [created index names]}"""
+    created = {}
+    for collection, indexes in INDEXES.items():
+        existing = set((await db[collection].index_information()).keys())
+        for index in indexes:
+            name = index.document['name']
+            if name in existing:
+                continue
+            try:
+                await db[collection].create_indexes([index])
+                created.setdefault(collection, []).append(name)
+            except OperationFailure as e:
+                # e.g. duplicate values blocking a unique index
+                logger.warning(f"Could not create index {collection}.{name}: {e}")
+    for collection, names in created.items():
+        logger.info(f"Created indexes on {collection}: {', '.join(names)}")
+    await check_query_patterns(db)
+    return created
+
+
+async def check_query_patterns(db) -> List[Tuple[str, List[str], List[str]]]:
+    """Warn about query shapes that no existing index can serve"""
+    uncovered = []
+    index_cache = {}
+    for collection, equality, sort in QUERY_PATTERNS:
+        if collection not in index_cache:
+            info = await db[collection].index_information()
+            index_cache[collection] = [[field for field, _ in spec['key']] for spec in info.values()]
+        if not any(_covers(fields, equality, sort) for fields in index_cache[collection]):
+            uncovered.append((collection, equality, sort))
+            logger.warning(
+                f"No index on {collection} serves filter={equality} sort={sort}"
+            )
+    return uncovered
+
+
+async def _main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent.parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        created = await ensure_indexes(client[os.environ['DB_NAME']])
+        if not created:
+            print("All indexes already exist")
+        for collection, names in created.items():
+            print(f"{collection}: created {', '.join(names)}")
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    asyncio.run(_main())
@@ -0,0 +1,194 @@
+"""
+Email Outbox
+Request handlers enqueue messages into the email_outbox collection and a
+background worker delivers them over SMTP. Failed sends are retried with
+exponential backoff; after EMAIL_MAX_ATTEMPTS a message is parked with
+status "failed" for inspection.
+"""
+import asyncio
+import logging
+import os
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from bson import Binary
+from pymongo import ReturnDocument
+
+from services.email_service import email_service
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+
+class EmailOutbox:
+    def __init__(self):
+        self.max_attempts = int(os.environ.get('EMAIL_MAX_ATTEMPTS', '6'))
+        self.backoff_base = float(os.environ.get('EMAIL_RETRY_BASE_SECONDS', '30'))
+        self.backoff_max = float(os.environ.get('EMAIL_RETRY_MAX_SECONDS', '3600'))
+        # A claimed message whose worker died is picked up again after this long
+        self.lease_seconds = float(os.environ.get('EMAIL_SEND_LEASE_SECONDS', '300'))
+        self.poll_interval = float(os.environ.get('EMAIL_OUTBOX_POLL_SECONDS', '10'))
+        # Messages claimed together and sent over one SMTP session
+        self.batch_size = int(os.environ.get('EMAIL_BATCH_SIZE', '20'))
+        self._db = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def enqueue(
+        self,
+        db,
+        to_email: str,
+        subject: str,
+        html_content: str,
+        attachment_data: Optional[bytes] = None,
+        attachment_filename: Optional[str] = None
+    ) -> bool:
+        """Queue a message for delivery; False (nothing queued) when SMTP isn't configured"""
+        if not email_service.is_configured:
+            logger.warning(f"Email not queued - SMTP credentials not configured. Would send to: {to_email}")
+            return False
+        now = datetime.now(timezone.utc)
+        await db.email_outbox.insert_one({
+            "id": str(uuid.uuid4()),
+            "to_email": to_email,
+            "subject": subject,
+            "html_content": html_content,
+            "attachment_data": Binary(attachment_data) if attachment_data else None,
+            "attachment_filename": attachment_filename,
+            "status": PENDING,
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+        })
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    async def _claim(self, db) -> Optional[dict]:
+        now = datetime.now(timezone.utc)
+        return await db.email_outbox.find_one_and_update(
+            {"$or": [
+                {"status": PENDING, "next_attempt_at": {"$lte": now}},
+                {"status": SENDING, "locked_until": {"$lt": now}},
+            ]},
+            {
+                "$set": {"status": SENDING, "locked_until": now + timedelta(seconds=self.lease_seconds)},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _finish(self, db, message: dict, error: Optional[Exception]):
+        if error is not None:
+            attempts = message['attempts']
+            if attempts >= self.max_attempts:
+                logger.error(f"Email {message['id']} to {message['to_email']} failed permanently: {error}")
+                update = {"status": FAILED, "last_error": str(error), "failed_at": datetime.now(timezone.utc)}
+            else:
+                delay = self._backoff(attempts)
+                logger.warning(f"Email {message['id']} attempt {attempts} failed, retrying in {delay:.0f}s: {error}")
+                update = {
+                    "status": PENDING,
+                    "last_error": str(error),
+                    "next_attempt_at": datetime.now(timezone.utc) + timedelta(seconds=delay),
+                }
+            await db.email_outbox.update_one({"id": message['id']}, {"$set": update, "$unset": {"locked_until": ""}})
+            return
+
+        await db.email_outbox.update_one(
+            {"id": message['id']},
+            {
+                "$set": {"status": SENT, "sent_at": datetime.now(timezone.utc)},
+                # The attachment is no longer needed once delivered
+                "$unset": {"locked_until": "", "attachment_data": ""},
+            }
+        )
+
+    async def drain(self, db) -> int:
+        """Deliver every message that is due; returns how many were attempted"""
+        count = 0
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                message = await self._claim(db)
+                if message is None:
+                    break
+                batch.append(message)
+            if not batch:
+                return count
+            errors = await asyncio.to_thread(email_service.send_many, [
+                {
+                    'to_email': message['to_email'],
+                    'subject': message['subject'],
+                    'html_content': message['html_content'],
+                    'attachment_data': bytes(message['attachment_data']) if message.get('attachment_data') else None,
+                    'attachment_filename': message.get('attachment_filename'),
+                }
+                for message in batch
+            ])
+            for message, error in zip(batch, errors):
+                await self._finish(db, message, error)
+            count += len(batch)
+
+    async def _next_due_in(self, db) -> float:
+        """Seconds until the earliest scheduled retry, capped at the poll interval"""
+        message = await db.email_outbox.find_one(
+            {"status": PENDING},
+            {"next_attempt_at": 1},
+            sort=[("next_attempt_at", 1)]
+        )
+        if not message:
+            return self.poll_interval
+        due = message['next_attempt_at']
+        if due.tzinfo is None:
+            due = due.replace(tzinfo=timezone.utc)
+        return max(0.0, min(self.poll_interval, (due - datetime.now(timezone.utc)).total_seconds()))
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            timeout = self.poll_interval
+            try:
+                await self.drain(self._db)
+                timeout = await self._next_due_in(self._db)
+            except Exception as e:
+                logger.error(f"Email outbox worker error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self, db):
+        if self._task is None:
+            self._db = db
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def stats(self, db) -> dict:
+        counts = {PENDING: 0, SENDING: 0, SENT: 0, FAILED: 0}
+        async for row in db.email_outbox.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        return counts
+
+
+email_outbox = EmailOutbox()
@@ -0,0 +1,339 @@
+"""
+Email Templates
+HTML bodies for outgoing emails as string.Template skeletons. Company
+settings are substituted once per distinct settings value set (cached),
+leaving a template that only needs the per-message values, which are
+HTML-escaped on render. Settings fields are admin-authored and may
+contain markup (e.g. the signature's <br>), so they are inserted as is.
+
+Benchmark: python -m services.email_templates
+"""
+import html
+from functools import lru_cache
+from string import Template
+from typing import List, Optional, Tuple
+
+# Placeholders admins can use inside the configurable texts; any other
+# "{...}" in a settings value is plain text
+_SETTINGS_PLACEHOLDERS = {
+    'quote_email_subject': ('quote_id', 'customer_name'),
+    'quote_email_greeting': ('customer_name',),
+    'quote_email_intro': ('quote_id',),
+}
+
+QUOTE_RESPONSE_DEFAULTS = {
+    'email_header_color': '#e06c1b',
+    'email_logo_url': '',
+    'company_name': 'Özmen Gıda',
+    'quote_email_subject': 'Teklif Talebiniz - #{quote_id}',
+    'quote_email_greeting': 'Sayın {customer_name},',
+    'quote_email_intro': 'Teklif talebiniz için teşekkür ederiz. Ekteki PDF dosyasında detaylı teklif bilgilerinizi bulabilirsiniz.',
+    'quote_email_details_title': 'Teklif Özeti',
+    'quote_email_button_text': 'Teklifi Görüntüle',
+    'quote_email_footer_note': 'Herhangi bir sorunuz için bizimle iletişime geçmekten çekinmeyin.',
+    'quote_email_signature': 'Saygılarımızla,<br>Özmen Gıda Ekibi',
+    'email_footer_text': 'Bu email otomatik olarak gönderilmiştir. Lütfen yanıtlamayınız.',
+    'company_phone': '',
+    'company_email': '',
+    'company_website': ''
+}
+
+PASSWORD_RESET_DEFAULTS = {
+    'company_name': 'Özmen Gıda',
+    'email_header_color': '#e06c1b',
+    'email_logo_url': '',
+}
+
+NEW_QUOTE_NOTIFICATION = Template("""
+        <html>
+        <body style="font-family: Arial, sans-serif;">
+            <h2 style="color: #3BB77E;">Yeni Teklif Talebi</h2>
+            <p><strong>Müşteri:</strong> $customer_name</p>
+            <p><strong>Firma:</strong> $company</p>
+            <p><strong>Email:</strong> $email</p>
+            <p><strong>Telefon:</strong> $phone</p>
+            <hr>
+            <h3>Talep Edilen Ürünler:</h3>
+            <ul>$items</ul>
+            $message
+            <hr>
+            <p>Admin panelinden teklife fiyat verebilir ve müşteriye gönderebilirsiniz.</p>
+        </body>
+        </html>
+        """)
+
+QUOTE_RESPONSE = Template("""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        </head>
+        <body style="margin: 0; padding: 0; font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif; background-color: #f3f4f6;">
+            <table width="100%" cellpadding="0" cellspacing="0" style="background-color: #f3f4f6; padding: 40px 20px;">
+                <tr>
+                    <td align="center">
+                        <table width="600" cellpadding="0" cellspacing="0" style="background-color: #ffffff; border-radius: 12px; overflow: hidden; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+                            <!-- Header -->
+                            <tr>
+                                <td style="background: linear-gradient(135deg, $email_header_color 0%, #c75a14 100%); padding: 40px 30px; text-align: center;">
+                                    $logo
+                                    <h1 style="margin: 0; color: #ffffff; font-size: 28px; font-weight: 700;">$company_name</h1>
+                                    <p style="margin: 10px 0 0 0; color: rgba(255,255,255,0.9); font-size: 16px;">Teklif Bildirimi</p>
+                                </td>
+                            </tr>
+
+                            <!-- Content -->
+                            <tr>
+                                <td style="padding: 40px 30px;">
+                                    <h2 style="margin: 0 0 20px 0; color: #111827; font-size: 24px; font-weight: 600;">Merhaba!</h2>
+                                    <p style="margin: 0 0 15px 0; color: #6b7280; font-size: 16px; line-height: 1.6;">$quote_email_greeting</p>
+                                    <p style="margin: 0 0 25px 0; color: #6b7280; font-size: 16px; line-height: 1.6;">$quote_email_intro</p>
+
+                                    <!-- Quote Details Box -->
+                                    <div style="background: linear-gradient(135deg, #f0fdf4 0%, #dcfce7 100%); border-left: 4px solid $email_header_color; padding: 20px; margin: 25px 0; border-radius: 8px;">
+                                        <h3 style="margin: 0 0 15px 0; color: $email_header_color; font-size: 18px; font-weight: 600;">$quote_email_details_title</h3>
+                                        <p style="margin: 0 0 8px 0; color: #374151; font-size: 15px;"><strong>Teklif No:</strong> #$${quote_id}</p>
+                                        <p style="margin: 0; color: #374151; font-size: 15px;"><strong>Müşteri:</strong> $${customer_name}</p>
+                                    </div>
+
+                                    <!-- Products Table -->
+                                    $${items_table}
+
+                                    <!-- Note -->
+                                    <p style="margin: 25px 0 30px 0; color: #6b7280; font-size: 15px; line-height: 1.6;">$quote_email_footer_note</p>
+
+                                    <!-- Signature -->
+                                    <div style="margin-top: 40px; padding-top: 25px; border-top: 2px solid #e5e7eb;">
+                                        <p style="margin: 0; color: #6b7280; font-size: 15px; line-height: 1.6;">$quote_email_signature</p>
+                                    </div>
+                                </td>
+                            </tr>
+
+                            <!-- Footer -->
+                            <tr>
+                                <td style="background-color: #f9fafb; padding: 30px; text-align: center; border-top: 1px solid #e5e7eb;">
+                                    <p style="margin: 0 0 10px 0; color: #9ca3af; font-size: 13px;">$email_footer_text</p>
+                                    $company_lines
+                                </td>
+                            </tr>
+                        </table>
+                    </td>
+                </tr>
+            </table>
+        </body>
+        </html>
+        """)
+
+QUOTE_ITEMS_HEADER = '<table style="width: 100%; border-collapse: collapse; margin: 20px 0;"><tr style="background: #f3f4f6;"><th style="padding: 12px; text-align: left; border-bottom: 2px solid #e5e7eb;">Ürün</th><th style="padding: 12px; text-align: center; border-bottom: 2px solid #e5e7eb;">Miktar</th><th style="padding: 12px; text-align: right; border-bottom: 2px solid #e5e7eb;">Fiyat</th></tr>'
+QUOTE_ITEM_ROW = Template('<tr><td style="padding: 12px; border-bottom: 1px solid #e5e7eb;">$product_name</td><td style="padding: 12px; text-align: center; border-bottom: 1px solid #e5e7eb;">$quantity adet</td><td style="padding: 12px; text-align: right; border-bottom: 1px solid #e5e7eb;">₺$total_price</td></tr>')
+QUOTE_ITEMS_TOTAL = Template('<tr style="background: #f9fafb;"><td colspan="2" style="padding: 12px; text-align: right; font-weight: bold;">TOPLAM:</td><td style="padding: 12px; text-align: right; font-weight: bold; color: $email_header_color; font-size: 18px;">₺$${total}</td></tr></table>')
+
+PASSWORD_RESET = Template("""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        </head>
+        <body style="margin: 0; padding: 0; font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; background-color: #f3f4f6;">
+            <table width="100%" cellpadding="0" cellspacing="0" style="background-color: #f3f4f6; padding: 40px 20px;">
+                <tr>
+                    <td align="center">
+                        <table width="600" cellpadding="0" cellspacing="0" style="background-color: #ffffff; border-radius: 12px; overflow: hidden; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+                            <!-- Header -->
+                            <tr>
+                                <td style="background: linear-gradient(135deg, $email_header_color 0%, #c75a14 100%); padding: 40px 30px; text-align: center;">
+                                    $logo
+                                    <h1 style="margin: 0; color: #ffffff; font-size: 28px; font-weight: 700;">$company_name</h1>
+                                    <p style="margin: 10px 0 0 0; color: rgba(255,255,255,0.9); font-size: 16px;">🔐 Şifre Sıfırlama</p>
+                                </td>
+                            </tr>
+
+                            <!-- Content -->
+                            <tr>
+                                <td style="padding: 40px 30px;">
+                                    <h2 style="margin: 0 0 20px 0; color: #111827; font-size: 24px; font-weight: 600;">Merhaba $${name}!</h2>
+                                    <p style="margin: 0 0 15px 0; color: #6b7280; font-size: 16px; line-height: 1.6;">
+                                        $${user_type} hesabınız için şifre sıfırlama talebinde bulundunuz.
+                                    </p>
+                                    <p style="margin: 0 0 25px 0; color: #6b7280; font-size: 16px; line-height: 1.6;">
+                                        Şifrenizi sıfırlamak için aşağıdaki butona tıklayın:
+                                    </p>
+
+                                    <!-- Reset Button -->
+                                    <div style="text-align: center; margin: 30px 0;">
+                                        <a href="$${reset_link}" style="display: inline-block; padding: 16px 40px; background: linear-gradient(135deg, $email_header_color 0%, #c75a14 100%); color: white; text-decoration: none; border-radius: 8px; font-size: 16px; font-weight: 700; box-shadow: 0 4px 12px rgba(224, 108, 27, 0.3);">
+                                            Şifremi Sıfırla
+                                        </a>
+                                    </div>
+
+                                    <!-- Warning Box -->
+                                    <div style="background: #FEF3C7; border-left: 4px solid #F59E0B; padding: 16px; margin: 25px 0; border-radius: 8px;">
+                                        <p style="margin: 0; color: #92400E; font-size: 14px; line-height: 1.6;">
+                                            ⚠️ <strong>Önemli:</strong> Bu link 1 saat geçerlidir. Eğer şifre sıfırlama talebinde bulunmadıysanız, bu emaili görmezden gelebilirsiniz.
+                                        </p>
+                                    </div>
+
+                                    <p style="margin: 25px 0 0 0; color: #9ca3af; font-size: 14px; line-height: 1.6;">
+                                        Buton çalışmıyorsa şu linki tarayıcınıza kopyalayın:<br>
+                                        <a href="$${reset_link}" style="color: $email_header_color; word-break: break-all;">$${reset_link}</a>
+                                    </p>
+
+                                    <!-- Signature -->
+                                    <div style="margin-top: 40px; padding-top: 25px; border-top: 2px solid #e5e7eb;">
+                                        <p style="margin: 0; color: #6b7280; font-size: 15px; line-height: 1.6;">
+                                            Saygılarımızla,<br>
+                                            $company_name Ekibi
+                                        </p>
+                                    </div>
+                                </td>
+                            </tr>
+
+                            <!-- Footer -->
+                            <tr>
+                                <td style="background-color: #f9fafb; padding: 30px; text-align: center; border-top: 1px solid #e5e7eb;">
+                                    <p style="margin: 0; color: #9ca3af; font-size: 13px;">Bu email otomatik olarak gönderilmiştir.</p>
+                                </td>
+                            </tr>
+                        </table>
+                    </td>
+                </tr>
+            </table>
+        </body>
+        </html>
+        """)
+
+
+def _setting(value, placeholders: Tuple[str, ...] = ()) -> str:
+    """A settings value ready to embed in a second-stage template"""
+    text = str(value if value is not None else '').replace('$', '$$')
+    for placeholder in placeholders:
+        text = text.replace('{' + placeholder + '}', '${' + placeholder + '}')
+    return text
+
+
+def _logo(url: str) -> str:
+    return f'<img src="{url}" alt="Logo" style="max-width: 150px; height: auto; margin-bottom: 20px;">' if url else ''
+
+
+def _settings_key(settings: Optional[dict], defaults: dict) -> Tuple[Tuple[str, str], ...]:
+    """Hashable view of the settings a template depends on"""
+    merged = {**defaults, **(settings or {})}
+    return tuple((key, merged.get(key)) for key in defaults)
+
+
+@lru_cache(maxsize=32)
+def _quote_response(key: Tuple[Tuple[str, str], ...]) -> Tuple[Template, Template, Template]:
+    s = dict(key)
+    values = {name: _setting(value, _SETTINGS_PLACEHOLDERS.get(name, ())) for name, value in s.items()}
+    values['logo'] = _setting(_logo(s['email_logo_url']))
+    company_lines = []
+    if s['company_name']:
+        company_lines.append(f'<p style="margin: 5px 0; color: #6b7280; font-size: 14px;"><strong>{s["company_name"]}</strong></p>')
+    if s.get('company_phone'):
+        company_lines.append(f'<p style="margin: 5px 0; color: #9ca3af; font-size: 13px;">📞 {s["company_phone"]}</p>')
+    if s.get('company_email'):
+        company_lines.append(f'<p style="margin: 5px 0; color: #9ca3af; font-size: 13px;">✉️ {s["company_email"]}</p>')
+    if s.get('company_website'):
+        company_lines.append(f'<p style="margin: 5px 0; color: #9ca3af; font-size: 13px;">🌐 {s["company_website"]}</p>')
+    values['company_lines'] = _setting('\n'.join(company_lines))
+    return (
+        Template(values['quote_email_subject']),
+        Template(QUOTE_RESPONSE.substitute(values)),
+        Template(QUOTE_ITEMS_TOTAL.substitute(values)),
+    )
+
+
+@lru_cache(maxsize=32)
+def _password_reset(key: Tuple[Tuple[str, str], ...]) -> Tuple[Template, Template]:
+    s = dict(key)
+    values = {name: _setting(value) for name, value in s.items()}
+    values['logo'] = _setting(_logo(s['email_logo_url']))
+    return (
+        Template(f"Şifre Sıfırlama Talebi - {values['company_name']}"),
+        Template(PASSWORD_RESET.substitute(values)),
+    )
+
+
+def render_new_quote_notification(quote_data: dict) -> Tuple[str, str]:
+    """(subject, html) for the admin's new quote notification"""
+    escape = html.escape
+    items = ''.join(
+        f"<li>{escape(str(item['product_name']))} - {escape(str(item['quantity']))} adet</li>"
+        for item in quote_data['items']
+    )
+    message = quote_data.get('message')
+    body = NEW_QUOTE_NOTIFICATION.substitute(
+        customer_name=escape(quote_data['customer_name']),
+        company=escape(quote_data.get('company') or '-'),
+        email=escape(quote_data['email']),
+        phone=escape(quote_data.get('phone') or '-'),
+        items=items,
+        message=f"<p><strong>Mesaj:</strong> {escape(message)}</p>" if message else ''
+    )
+    return f"Yeni Teklif Talebi - {quote_data['customer_name']}", body
+
+
+def render_quote_response(quote_data: dict, settings: Optional[dict] = None) -> Tuple[str, str]:
+    """(subject, html) for the customer's quote email"""
+    subject, body, total_row = _quote_response(_settings_key(settings, QUOTE_RESPONSE_DEFAULTS))
+    customer_name = quote_data['customer_name']
+    quote_id = quote_data['id'][:8].upper()
+
+    items_table = ''
+    if quote_data.get('pricing'):
+        rows: List[str] = [QUOTE_ITEMS_HEADER]
+        total = 0
+        for item in quote_data['pricing']:
+            rows.append(QUOTE_ITEM_ROW.substitute(
+                product_name=html.escape(str(item['product_name'])),
+                quantity=html.escape(str(item['quantity'])),
+                total_price=f"{item['total_price']:.2f}"
+            ))
+            total += item['total_price']
+        rows.append(total_row.substitute(total=f"{total:.2f}"))
+        items_table = ''.join(rows)
+
+    return (
+        subject.substitute(customer_name=customer_name, quote_id=quote_id),
+        body.substitute(
+            customer_name=html.escape(customer_name),
+            quote_id=quote_id,
+            items_table=items_table
+        )
+    )
+
+
+def render_password_reset(name: str, reset_link: str, settings: Optional[dict] = None, is_admin: bool = False) -> Tuple[str, str]:
+    """(subject, html) for a password reset email"""
+    subject, body = _password_reset(_settings_key(settings, PASSWORD_RESET_DEFAULTS))
+    return (
+        subject.substitute(),
+        body.substitute(
+            name=html.escape(name),
+            user_type="Admin" if is_admin else "Müşteri",
+            reset_link=html.escape(reset_link)
+        )
+    )
+
+
+if __name__ == '__main__':
+    import timeit
+
+    quote = {
+        'id': 'a1b2c3d4-0000-0000-0000-000000000000',
+        'customer_name': 'Ayşe <Yılmaz>',
+        'email': 'ayse@example.com',
+        'items': [{'product_name': f'Ürün {i}', 'quantity': i} for i in range(1, 21)],
+        'pricing': [{'product_name': f'Ürün {i}', 'quantity': i, 'total_price': i * 12.5} for i in range(1, 21)],
+    }
+    settings = {'company_name': 'Örnek A.Ş.', 'company_phone': '0212 000 00 00'}
+    for label, func in (
+        ('quote response', lambda: render_quote_response(quote, settings)),
+        ('password reset', lambda: render_password_reset('Ayşe', 'https://example.com/r?token=x', settings)),
+        ('new quote notification', lambda: render_new_quote_notification(quote)),
+    ):
+        runs = 5000
+        seconds = timeit.timeit(func, number=runs)
+        print(f"{label}: {seconds / runs * 1e6:.1f} µs/render")
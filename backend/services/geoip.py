@@ -0,0 +1,192 @@
+"""
+Offline GeoIP Lookup
+Loads an IP-range database (GEOIP_DB_PATH) into sorted per-family arrays
+and answers lookups with a binary search, no network needed.
+
+Supported files:
+- CSV: start_ip,end_ip,country[,region[,city[,timezone]]] where the range
+  bounds are IP addresses or integers; a header row is skipped
+- MMDB (MaxMind / DB-IP): flattened into the same arrays; needs the
+  optional maxminddb package
+"""
+import csv
+import ipaddress
+import logging
+import os
+import threading
+from array import array
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Location = Tuple[str, str, str, str]  # country, region, city, timezone
+
+
+def _mmdb_name(record: dict, key: str) -> str:
+    return ((record.get(key) or {}).get('names') or {}).get('en', '')
+
+
+def _to_int(value: str) -> Tuple[int, int]:
+    """(ip version, integer value) of an IP address or plain integer string"""
+    value = value.strip()
+    if value.isdigit():
+        number = int(value)
+        return (4 if number < 2 ** 32 else 6), number
+    address = ipaddress.ip_address(value)
+    if address.version == 6 and address.ipv4_mapped:
+        return 4, int(address.ipv4_mapped)
+    return address.version, int(address)
+
+
+class _RangeIndex:
+    """Non-overlapping [start, end] ranges sorted by start, each pointing at a location"""
+
+    def __init__(self, typecode: Optional[str]):
+        # IPv4 bounds fit a compact unsigned array; IPv6 needs Python ints
+        self.starts = array(typecode) if typecode else []
+        self.ends = array(typecode) if typecode else []
+        self.values = array('I')
+
+    def add(self, start: int, end: int, value: int):
+        self.starts.append(start)
+        self.ends.append(end)
+        self.values.append(value)
+
+    def sort(self):
+        order = sorted(range(len(self.starts)), key=self.starts.__getitem__)
+        for name in ('starts', 'ends', 'values'):
+            column = getattr(self, name)
+            sorted_column = [column[i] for i in order]
+            setattr(self, name, array(column.typecode, sorted_column) if isinstance(column, array) else sorted_column)
+
+    def find(self, number: int) -> Optional[int]:
+        position = bisect_right(self.starts, number) - 1
+        if position >= 0 and self.ends[position] >= number:
+            return self.values[position]
+        return None
+
+    def __len__(self):
+        return len(self.starts)
+
+
+class GeoIPDatabase:
+    def __init__(self):
+        self._v4 = _RangeIndex('I')
+        self._v6 = _RangeIndex(None)
+        # Locations are heavily repeated; store each distinct one once
+        self._locations: List[Location] = []
+        self._location_ids: Dict[Location, int] = {}
+
+    def _location_id(self, location: Location) -> int:
+        location_id = self._location_ids.get(location)
+        if location_id is None:
+            location_id = len(self._locations)
+            self._locations.append(location)
+            self._location_ids[location] = location_id
+        return location_id
+
+    def add_range(self, start: str, end: str, location: Location):
+        start_version, start_number = _to_int(start)
+        end_version, end_number = _to_int(end)
+        if start_version != end_version or end_number < start_number:
+            raise ValueError(f"bad range {start} - {end}")
+        index = self._v4 if start_version == 4 else self._v6
+        index.add(start_number, end_number, self._location_id(location))
+
+    def finalize(self):
+        self._v4.sort()
+        self._v6.sort()
+        self._location_ids = {}
+
+    def lookup(self, ip: str) -> Optional[Location]:
+        try:
+            version, number = _to_int(ip)
+        except ValueError:
+            return None
+        location_id = (self._v4 if version == 4 else self._v6).find(number)
+        return self._locations[location_id] if location_id is not None else None
+
+    def __len__(self):
+        return len(self._v4) + len(self._v6)
+
+    @classmethod
+    def from_csv(cls, path: str) -> 'GeoIPDatabase':
+        database = cls()
+        with open(path, newline='', encoding='utf-8') as f:
+            for line_number, row in enumerate(csv.reader(f), start=1):
+                if len(row) < 3:
+                    continue
+                fields = [field.strip() for field in row[2:6]] + [''] * 4
+                location = (fields[0] or 'Unknown', fields[1] or 'Unknown', fields[2] or 'Unknown', fields[3] or 'UTC')
+                try:
+                    database.add_range(row[0], row[1], location)
+                except ValueError:
+                    if line_number > 1:
+                        logger.warning(f"Skipping GeoIP row {line_number}: {row[:2]}")
+        database.finalize()
+        return database
+
+    @classmethod
+    def from_mmdb(cls, path: str) -> 'GeoIPDatabase':
+        import maxminddb
+
+        database = cls()
+        with maxminddb.open_database(path) as reader:
+            for network, record in reader:
+                record = record or {}
+                subdivisions = record.get('subdivisions') or [{}]
+                location = (
+                    _mmdb_name(record, 'country') or 'Unknown',
+                    (subdivisions[0].get('names') or {}).get('en') or 'Unknown',
+                    _mmdb_name(record, 'city') or 'Unknown',
+                    (record.get('location') or {}).get('time_zone') or 'UTC',
+                )
+                database.add_range(str(network.network_address), str(network.broadcast_address), location)
+        database.finalize()
+        return database
+
+
+class GeoIPResolver:
+    """Lazily loads GEOIP_DB_PATH on first use; lookup() is None when no database is available"""
+
+    def __init__(self):
+        self.path = os.environ.get('GEOIP_DB_PATH', '')
+        self._database: Optional[GeoIPDatabase] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.path)
+
+    def _load(self) -> Optional[GeoIPDatabase]:
+        try:
+            if self.path.lower().endswith('.mmdb'):
+                database = GeoIPDatabase.from_mmdb(self.path)
+            else:
+                database = GeoIPDatabase.from_csv(self.path)
+            logger.info(f"GeoIP database loaded from {self.path}: {len(database)} ranges")
+            return database
+        except ImportError:
+            logger.error("GEOIP_DB_PATH points to an MMDB file but the maxminddb package is not installed")
+        except Exception as e:
+            logger.error(f"Could not load GeoIP database {self.path}: {e}")
+        return None
+
+    def lookup(self, ip: str) -> Optional[dict]:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._database = self._load() if self.path else None
+                    self._loaded = True
+        if self._database is None:
+            return None
+        location = self._database.lookup(ip)
+        if location is None:
+            return None
+        country, region, city, timezone = location
+        return {'country': country, 'city': city, 'region': region, 'timezone': timezone}
+
+
+geoip = GeoIPResolver()
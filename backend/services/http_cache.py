@@ -0,0 +1,62 @@
+"""
+HTTP Caching Helpers
+Strong ETags, 304 Not Modified handling and Cache-Control headers for
+public read endpoints. The admin UI reads the same URLs right after
+writing, so by default clients revalidate every time (no-cache) and the
+ETag keeps that to a cheap 304; HTTP_CACHE_MAX_AGE opts into freshness.
+"""
+import hashlib
+import os
+
+from fastapi import Request
+from fastapi.responses import Response
+
+MAX_AGE = int(os.environ.get('HTTP_CACHE_MAX_AGE', '0'))
+STALE_WHILE_REVALIDATE = int(os.environ.get('HTTP_CACHE_STALE_WHILE_REVALIDATE', '0'))
+
+
+def cache_control(max_age: int = None) -> str:
+    max_age = MAX_AGE if max_age is None else max_age
+    if max_age <= 0:
+        return "no-cache"
+    value = f"public, max-age={max_age}"
+    if STALE_WHILE_REVALIDATE > 0:
+        value += f", stale-while-revalidate={STALE_WHILE_REVALIDATE}"
+    return value
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag from a content version (or the content itself)"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+        digest.update(b'\x00')
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def _matches(request: Request, etag: str) -> bool:
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # Weak comparison is what If-None-Match requires
+    candidates = [value.strip().removeprefix('W/') for value in header.split(',')]
+    return etag in candidates
+
+
+def not_modified(request: Request, etag: str, max_age: int = None):
+    """304 response if the client already has this ETag, else None"""
+    if _matches(request, etag):
+        return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': cache_control(max_age)})
+    return None
+
+
+def cached_json(request: Request, content: bytes, etag: str = None, max_age: int = None) -> Response:
+    """JSON response with ETag / Cache-Control; 304 when the client copy is current"""
+    etag = etag or make_etag(content)
+    return not_modified(request, etag, max_age) or Response(
+        content=content,
+        media_type="application/json",
+        headers={'ETag': etag, 'Cache-Control': cache_control(max_age)}
+    )
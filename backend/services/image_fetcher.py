@@ -0,0 +1,117 @@
+"""
+Image Fetcher
+Loads the images of a PDF concurrently under one overall deadline and
+keeps the results in a process-wide LRU cache. Failures are cached for a
+shorter time so dead URLs don't stall every render.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class ImageFetcher:
+    def __init__(self):
+        self.max_workers = int(os.environ.get('IMAGE_FETCH_WORKERS', '8'))
+        self.request_timeout = float(os.environ.get('IMAGE_FETCH_TIMEOUT', '5'))
+        self.deadline = float(os.environ.get('IMAGE_FETCH_DEADLINE', '8'))
+        self.cache_size = int(os.environ.get('IMAGE_CACHE_SIZE', '512'))
+        self.ttl = float(os.environ.get('IMAGE_CACHE_TTL', '3600'))
+        self.negative_ttl = float(os.environ.get('IMAGE_NEGATIVE_CACHE_TTL', '300'))
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._session: Optional[requests.Session] = None
+
+    @property
+    def session(self) -> requests.Session:
+        # Created lazily so the pool and sockets belong to the process that uses them
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+        return self._session
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.request_timeout)
+        return self.session.get(url, **kwargs)
+
+    def _cached(self, key: str):
+        """(found, value) for a live cache entry"""
+        entry = self._cache.get(key)
+        if entry is None:
+            return False, None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return False, None
+        self._cache.move_to_end(key)
+        return True, value
+
+    def _store(self, key: str, value: Optional[bytes]):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        with self._lock:
+            self._cache[key] = (value, time.monotonic() + ttl)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _load(self, key: str, loader: Callable[[str], Optional[bytes]]):
+        try:
+            value = loader(key)
+        except Exception as e:
+            logger.warning(f"Could not fetch image {key}: {e}")
+            value = None
+        self._store(key, value)
+        with self._lock:
+            self._inflight.pop(key, None)
+        return value
+
+    def fetch_many(
+        self,
+        keys: Iterable[str],
+        loader: Callable[[str], Optional[bytes]],
+        deadline: float = None
+    ) -> Dict[str, Optional[bytes]]:
+        """Load every key concurrently; keys not done by the deadline map to None"""
+        results: Dict[str, Optional[bytes]] = {}
+        pending = {}
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='image-fetch')
+            for key in dict.fromkeys(keys):
+                found, value = self._cached(key)
+                if found:
+                    results[key] = value
+                    continue
+                # Share one fetch between renders that need the same image
+                future = self._inflight.get(key)
+                if future is None:
+                    future = self._executor.submit(self._load, key, loader)
+                    self._inflight[key] = future
+                pending[key] = future
+
+        if pending:
+            wait(pending.values(), timeout=self.deadline if deadline is None else deadline)
+            for key, future in pending.items():
+                if future.done():
+                    results[key] = future.result()
+                else:
+                    # Left running; it will populate the cache for the next render
+                    logger.warning(f"Image fetch missed the render deadline: {key}")
+                    results[key] = None
+        return results
+
+
+image_fetcher = ImageFetcher()
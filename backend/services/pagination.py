@@ -0,0 +1,38 @@
+"""
+Keyset Pagination Helpers
+Opaque cursors over (created_at, id) for newest-first listings
+"""
+import base64
+import json
+from datetime import datetime
+
+
+def encode_cursor(doc: dict) -> str:
+    """Build an opaque cursor pointing just after this document"""
+    created_at = doc.get('created_at')
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    raw = json.dumps([created_at, doc.get('id')], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Return (created_at, id) from a cursor; raises ValueError if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return created_at, doc_id
+
+
+def after_cursor_filter(cursor: str) -> dict:
+    """Mongo filter for documents after the cursor in (created_at, id) descending order"""
+    created_at, doc_id = decode_cursor(cursor)
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "id": {"$lt": doc_id}},
+    ]}
+
+
+NEWEST_FIRST = [("created_at", -1), ("id", -1)]
@@ -0,0 +1,71 @@
+"""
+Password Hashing Service
+Runs bcrypt hashing and verification on a bounded worker pool so login
+bursts don't block the event loop
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+
+class PasswordHasher:
+    def __init__(self):
+        # bcrypt releases the GIL, so threads give real parallelism here
+        self.max_workers = int(os.environ.get('BCRYPT_WORKERS', '2'))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix='bcrypt'
+        )
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self.peak_queue_depth = 0
+        self.completed = 0
+
+    def _run(self, func, *args):
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self.completed += 1
+
+    async def _submit(self, func, *args):
+        with self._lock:
+            self._queued += 1
+            self.peak_queue_depth = max(self.peak_queue_depth, self._queued)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._run, func, *args)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit(
+            bcrypt.checkpw,
+            plain_password.encode('utf-8'),
+            hashed_password.encode('utf-8')
+        )
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._submit(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt())
+        return hashed.decode('utf-8')
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'queue_depth': self._queued,
+                'running': self._running,
+                'peak_queue_depth': self.peak_queue_depth,
+                'completed': self.completed,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+password_hasher = PasswordHasher()
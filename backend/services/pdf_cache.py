@@ -0,0 +1,95 @@
+"""
+Quote PDF Cache
+Rendered quote PDFs keyed by a hash of the quote content and the settings
+version, kept in memory with LRU eviction under PDF_CACHE_MAX_BYTES.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+
+def _json_default(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def pdf_cache_key(quote: dict, settings_version: int, base_url: str = None) -> str:
+    """Content address for a rendered quote: any change to the quote or settings changes it"""
+    payload = json.dumps(
+        [quote, settings_version, base_url],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=_json_default
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PDFCache:
+    def __init__(self):
+        self.max_bytes = int(os.environ.get('PDF_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._by_quote: Dict[str, Set[str]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _drop(self, key: str):
+        quote_id, data = self._entries.pop(key)
+        self._bytes -= len(data)
+        keys = self._by_quote.get(quote_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_quote[quote_id]
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, quote_id: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (quote_id, data)
+            self._by_quote.setdefault(quote_id, set()).add(key)
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_quote(self, quote_id: str):
+        with self._lock:
+            for key in list(self._by_quote.get(quote_id, ())):
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_quote.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+pdf_cache = PDFCache()
@@ -14,8 +14,10 @@ from datetime import datetime
 from typing import List, Dict, Optional
 import logging
 import os
-import requests
 from PIL import Image as PILImage
+from services.image_fetcher import image_fetcher
+from services.thumbnails import ensure_file_thumbnail, make_thumbnail
+from services.uploads import resolve_upload
 
 logger = logging.getLogger(__name__)
 
@@ -134,30 +136,26 @@ class PDFService:
             alignment=TA_CENTER
         ))
 
-    def _fetch_image(self, image_url: str, base_url: str = None) -> Optional[BytesIO]:
-        """Fetch image from URL or local path"""
-        try:
-            # If it's a local path (starts with /uploads/)
-            if image_url.startswith('/uploads/'):
-                local_path = f"/app/backend{image_url}"
-                if os.path.exists(local_path):
-                    with open(local_path, 'rb') as f:
-                        return BytesIO(f.read())
-                elif base_url:
-                    # Try to fetch from backend URL
-                    full_url = f"{base_url}{image_url}"
-                    response = requests.get(full_url, timeout=5)
-                    if response.status_code == 200:
-                        return BytesIO(response.content)
-            else:
-                # External URL
-                response = requests.get(image_url, timeout=5)
-                if response.status_code == 200:
-                    return BytesIO(response.content)
-        except Exception as e:
-            logger.warning(f"Could not fetch image {image_url}: {e}")
+    @staticmethod
+    def _thumbnail(data: bytes) -> bytes:
+        # Embed a small re-encoded copy; fall back to the original if Pillow can't read it
+        return make_thumbnail(data) or data
+
+    def _fetch_image(self, image_url: str) -> Optional[bytes]:
+        """Fetch thumbnail of an external image"""
+        response = image_fetcher.get(image_url)
+        if response.status_code == 200:
+            return self._thumbnail(response.content)
         return None
 
+    @staticmethod
+    def _local_image(image_url: str, base_url: str = None) -> Optional[str]:
+        """Thumbnail file for an /uploads/ image, read straight from UPLOAD_DIR"""
+        path = resolve_upload(image_url, base_url)
+        if path is None:
+            return None
+        return str(ensure_file_thumbnail(path) or path)
+
     # --------------------------------------------------
     #  ANA FONKSİYON
     # --------------------------------------------------
@@ -261,6 +259,20 @@ class PDFService:
         # Otherwise, use original items
         items_to_display = pricing_data if (pricing_data and quote_data.get('status') == 'onaylandi') else quote_data['items']
 
+        # Uploads are handed to ReportLab as file paths; external images are
+        # fetched up front, concurrently and under one deadline
+        images = {}
+        remote_urls = []
+        for item in items_to_display:
+            image_url = item.get('product_image')
+            if not image_url or image_url in images:
+                continue
+            if image_url.startswith('/uploads/') or (base_url and image_url.startswith(base_url)):
+                images[image_url] = self._local_image(image_url, base_url)
+            else:
+                remote_urls.append(image_url)
+        images.update(image_fetcher.fetch_many(remote_urls, self._fetch_image))
+
         for item in items_to_display:
             product_name = item['product_name']
             quantity = item['quantity']
@@ -269,10 +281,11 @@ class PDFService:
             # Fetch and prepare image
             img_element = ''
             if product_image:
-                img_data = self._fetch_image(product_image, base_url)
+                img_data = images.get(product_image)
                 if img_data:
                     try:
-                        img = Image(img_data, width=15*mm, height=15*mm)
+                        source = img_data if isinstance(img_data, str) else BytesIO(img_data)
+                        img = Image(source, width=15*mm, height=15*mm)
                         img_element = img
                     except:
                         img_element = ''
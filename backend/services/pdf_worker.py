@@ -0,0 +1,122 @@
+"""
+PDF Render Pool
+Runs ReportLab quote rendering in a process pool so layout work and image
+fetches never block the API event loop. Bounded by PDF_WORKERS processes,
+PDF_MAX_QUEUE outstanding jobs and a PDF_TIMEOUT_SECONDS per-job deadline.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PDFQueueFull(Exception):
+    """Too many PDF jobs are already queued or running"""
+
+
+class PDFRenderTimeout(Exception):
+    """A PDF job did not finish within the per-job deadline"""
+
+
+def _render_quote_pdf(quote_data: dict, pricing_data, company_settings, base_url) -> bytes:
+    # Runs in the worker process; the service (fonts, styles) is built once per process
+    from services.pdf_service import pdf_service
+    return pdf_service.generate_quote_pdf(quote_data, pricing_data, company_settings, base_url)
+
+
+class PDFRenderPool:
+    def __init__(self):
+        self.max_workers = int(os.environ.get('PDF_WORKERS', '2'))
+        self.max_queue = int(os.environ.get('PDF_MAX_QUEUE', '16'))
+        self.timeout = float(os.environ.get('PDF_TIMEOUT_SECONDS', '30'))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self.peak_outstanding = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.failed = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that runs an event loop and Motor threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    def _job_done(self, future):
+        # Slots are released when the worker finishes, not when the caller gives up,
+        # so timed-out jobs still count against the queue limit while they run
+        with self._lock:
+            self._outstanding -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    async def render_quote(
+        self,
+        quote_data: dict,
+        pricing_data: Optional[List[Dict]] = None,
+        company_settings: Optional[dict] = None,
+        base_url: str = None
+    ) -> bytes:
+        with self._lock:
+            if self._outstanding >= self.max_queue:
+                self.rejected += 1
+                raise PDFQueueFull()
+            self._outstanding += 1
+            self.peak_outstanding = max(self.peak_outstanding, self._outstanding)
+            try:
+                future = self._get_executor().submit(
+                    _render_quote_pdf, quote_data, pricing_data, company_settings, base_url
+                )
+            except BrokenProcessPool:
+                self._outstanding -= 1
+                self._executor = None
+                raise
+        future.add_done_callback(self._job_done)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise PDFRenderTimeout()
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); start a fresh pool for the next job
+            with self._lock:
+                self._executor = None
+            logger.error("PDF worker pool broke; it will be recreated")
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'outstanding': self._outstanding,
+                'peak_outstanding': self.peak_outstanding,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+pdf_render_pool = PDFRenderPool()
@@ -0,0 +1,89 @@
+"""
+Product Search Index
+In-process inverted index over product names and descriptions with
+Turkish case/diacritic folding, prefix matching and relevance ranking.
+Rebuilt by the catalog snapshot whenever the catalog changes.
+"""
+import re
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, Iterable, List
+
+_TURKISH_FOLD = str.maketrans({
+    'İ': 'i', 'I': 'i', 'ı': 'i',
+    'Ş': 's', 'ş': 's',
+    'Ğ': 'g', 'ğ': 'g',
+    'Ü': 'u', 'ü': 'u',
+    'Ö': 'o', 'ö': 'o',
+    'Ç': 'c', 'ç': 'c',
+})
+_TOKEN_RE = re.compile(r'\w+')
+
+NAME_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+# Whole-word hits rank above prefix-only hits
+EXACT_BONUS = 2.0
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip Turkish and other diacritics ("Şeker İÇİ" -> "seker ici")"""
+    text = (text or '').translate(_TURKISH_FOLD).lower()
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(fold(text))
+
+
+class ProductSearchIndex:
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._names: Dict[str, str] = {}
+        self._tokens: List[str] = []
+
+    def build(self, products: Iterable[dict]):
+        postings = {}
+        names = {}
+        for product in products:
+            product_id = product['id']
+            names[product_id] = fold(product.get('name', ''))
+            for field, weight in (('name', NAME_WEIGHT), ('description', DESCRIPTION_WEIGHT)):
+                for token in tokenize(product.get(field) or ''):
+                    docs = postings.setdefault(token, {})
+                    docs[product_id] = docs.get(product_id, 0.0) + weight
+        self._postings = postings
+        self._names = names
+        self._tokens = sorted(postings)
+
+    def _match_token(self, query_token: str) -> Dict[str, float]:
+        scores = {}
+        tokens = self._tokens
+        # Walk the sorted vocabulary in place: cost follows the number of matches
+        i = bisect_left(tokens, query_token)
+        while i < len(tokens) and tokens[i].startswith(query_token):
+            token = tokens[i]
+            i += 1
+            bonus = EXACT_BONUS if token == query_token else 1.0
+            for product_id, weight in self._postings[token].items():
+                scores[product_id] = max(scores.get(product_id, 0.0), weight * bonus)
+        return scores
+
+    def search(self, query: str) -> List[str]:
+        """Product ids matching every query term (as a word prefix), best first"""
+        query_tokens = list(dict.fromkeys(tokenize(query)))
+        if not query_tokens:
+            return []
+        totals = None
+        for query_token in query_tokens:
+            scores = self._match_token(query_token)
+            if totals is None:
+                totals = scores
+            else:
+                totals = {pid: totals[pid] + score for pid, score in scores.items() if pid in totals}
+            if not totals:
+                return []
+        return sorted(totals, key=lambda pid: (-totals[pid], self._names.get(pid, '')))
+
+
+product_search = ProductSearchIndex()
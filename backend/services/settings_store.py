@@ -0,0 +1,64 @@
+"""
+Company Settings Store
+Keeps the company settings document in memory. Updates are a single
+upsert that bumps a version field, so readers never see a missing
+document; other workers pick the new version up within
+SETTINGS_CACHE_TTL seconds.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+
+class SettingsStore:
+    def __init__(self):
+        self.ttl = float(os.environ.get('SETTINGS_CACHE_TTL', '5'))
+        self._settings: Optional[dict] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def version(self) -> int:
+        return (self._settings or {}).get('version', 0)
+
+    async def _reload(self, db):
+        self._settings = await db.settings.find_one({}, {"_id": 0})
+        self._loaded_at = time.monotonic()
+
+    async def get(self, db) -> Optional[dict]:
+        """Stored settings (including version), or None if never saved.
+        Returns a shallow copy so callers can't mutate the cached document."""
+        if time.monotonic() - self._loaded_at >= self.ttl:
+            async with self._lock:
+                if time.monotonic() - self._loaded_at >= self.ttl:
+                    await self._reload(db)
+        return dict(self._settings) if self._settings is not None else None
+
+    async def update(self, db, fields: dict) -> dict:
+        """Atomically replace the settings fields and bump the version"""
+        fields = {key: value for key, value in fields.items() if key != 'version'}
+        settings = await db.settings.find_one_and_update(
+            {},
+            {"$set": fields, "$inc": {"version": 1}},
+            projection={"_id": 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._settings = settings
+        self._loaded_at = time.monotonic()
+        logger.info(f"Company settings updated to v{settings.get('version')}")
+        return dict(settings)
+
+
+def public_settings(settings: dict) -> dict:
+    """Settings as served to clients, without internal bookkeeping fields"""
+    return {key: value for key, value in settings.items() if key != 'version'}
+
+
+settings_store = SettingsStore()
@@ -0,0 +1,104 @@
+"""
+SMTP Connection Pool
+Keeps authenticated SMTP sessions open between sends. Idle sessions are
+closed after SMTP_IDLE_TIMEOUT seconds and checked with NOOP before reuse
+once they have been idle for SMTP_HEALTHCHECK_AFTER seconds.
+"""
+import logging
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPConnectionPool:
+    def __init__(
+        self,
+        connect: Callable[[], smtplib.SMTP],
+        max_size: int = 2,
+        idle_timeout: float = 60.0,
+        healthcheck_after: float = 5.0
+    ):
+        self._connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.healthcheck_after = healthcheck_after
+        self._idle: List[Tuple[smtplib.SMTP, float]] = []
+        self._lock = threading.Lock()
+        # Bounds open sessions; SMTP servers limit concurrent logins per account
+        self._slots = threading.BoundedSemaphore(max_size)
+        self.created = 0
+        self.reused = 0
+
+    @staticmethod
+    def _close(conn: smtplib.SMTP):
+        try:
+            conn.quit()
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _healthy(self, conn: smtplib.SMTP) -> bool:
+        try:
+            return conn.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _checkout(self, fresh: bool) -> smtplib.SMTP:
+        now = time.monotonic()
+        while not fresh:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, last_used = self._idle.pop()
+            idle_for = now - last_used
+            if idle_for > self.idle_timeout:
+                self._close(conn)
+                continue
+            if idle_for > self.healthcheck_after and not self._healthy(conn):
+                self._close(conn)
+                continue
+            self.reused += 1
+            return conn
+        conn = self._connect()
+        self.created += 1
+        return conn
+
+    @contextmanager
+    def connection(self, fresh: bool = False):
+        """Borrow a session (a newly opened one if fresh); it's returned to the pool unless the block raised"""
+        self._slots.acquire()
+        conn = None
+        try:
+            conn = self._checkout(fresh)
+            yield conn
+        except Exception:
+            if conn is not None:
+                self._close(conn)
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+            self._slots.release()
+
+    def close_idle(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'max_size': self.max_size,
+                'idle': len(self._idle),
+                'created': self.created,
+                'reused': self.reused,
+            }
@@ -0,0 +1,51 @@
+"""
+NDJSON Streaming
+Streams Motor cursors (or any async iterable of documents) as
+newline-delimited JSON so large admin exports don't have to be
+materialized in memory
+"""
+import inspect
+import json
+import os
+from datetime import datetime
+from typing import Callable, Optional
+
+from fastapi.responses import StreamingResponse
+
+BATCH_SIZE = int(os.environ.get('NDJSON_BATCH_SIZE', '500'))
+# Flush to the client once this many bytes are buffered
+CHUNK_BYTES = 64 * 1024
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+async def _iter_ndjson(source, transform: Optional[Callable]):
+    if hasattr(source, 'batch_size'):
+        source = source.batch_size(BATCH_SIZE)
+    chunk = []
+    size = 0
+    async for doc in source:
+        if transform:
+            doc = transform(doc)
+            if inspect.isawaitable(doc):
+                doc = await doc
+            if doc is None:
+                continue
+        line = json.dumps(doc, ensure_ascii=False, default=_json_default).encode('utf-8') + b'\n'
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield b''.join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield b''.join(chunk)
+
+
+def ndjson_response(source, transform: Optional[Callable] = None) -> StreamingResponse:
+    """Stream a cursor as NDJSON; transform may return None to skip a document"""
+    return StreamingResponse(_iter_ndjson(source, transform), media_type="application/x-ndjson")
@@ -0,0 +1,73 @@
+"""
+Image Thumbnails
+Small, re-encoded JPEG variants of product images for PDF embedding.
+Thumbnails of uploads are cached next to the originals under
+uploads/.thumbs and regenerated when the original changes.
+"""
+import logging
+import os
+from io import BytesIO
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image as PILImage, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# 15mm at ~300 dpi
+THUMBNAIL_SIZE = int(os.environ.get('THUMBNAIL_SIZE', '180'))
+THUMBNAIL_QUALITY = int(os.environ.get('THUMBNAIL_QUALITY', '80'))
+THUMBNAIL_DIR_NAME = '.thumbs'
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff'}
+
+
+def make_thumbnail(source, size: int = THUMBNAIL_SIZE) -> Optional[bytes]:
+    """Downscale and re-encode image bytes (or a file path) as JPEG; None if Pillow can't read it"""
+    try:
+        with PILImage.open(BytesIO(source) if isinstance(source, bytes) else source) as img:
+            img.draft('RGB', (size, size))  # lets JPEG decode at a reduced scale
+            img = ImageOps.exif_transpose(img)
+            if img.mode in ('RGBA', 'LA', 'P'):
+                img = img.convert('RGBA')
+                background = PILImage.new('RGB', img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel('A'))
+                img = background
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+            img.thumbnail((size, size), PILImage.LANCZOS)
+            out = BytesIO()
+            img.save(out, format='JPEG', quality=THUMBNAIL_QUALITY, optimize=True)
+            return out.getvalue()
+    except Exception as e:
+        logger.warning(f"Could not create thumbnail: {e}")
+        return None
+
+
+def thumbnail_path(source: Path, size: int = THUMBNAIL_SIZE) -> Path:
+    return source.parent / THUMBNAIL_DIR_NAME / f"{source.stem}_{size}.jpg"
+
+
+def ensure_file_thumbnail(source, size: int = THUMBNAIL_SIZE) -> Optional[Path]:
+    """Path of an up-to-date thumbnail for a local image, creating it if needed"""
+    source = Path(source)
+    if source.suffix.lower() not in IMAGE_EXTENSIONS:
+        return None
+    target = thumbnail_path(source, size)
+    try:
+        source_mtime = source.stat().st_mtime
+        if target.exists() and target.stat().st_mtime >= source_mtime:
+            return target
+        # Pillow reads the file itself, decoding JPEGs at reduced scale
+        thumb = make_thumbnail(source, size)
+        if thumb is None:
+            return None
+        target.parent.mkdir(exist_ok=True)
+        # Write-then-rename so concurrent renderers never read a partial file
+        tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(thumb)
+        os.replace(tmp, target)
+        return target
+    except OSError as e:
+        logger.warning(f"Could not cache thumbnail for {source}: {e}")
+        return None
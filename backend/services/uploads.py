@@ -0,0 +1,34 @@
+"""
+Upload Storage
+Location of uploaded files (UPLOAD_DIR, default backend/uploads) and
+resolution of /uploads/... URLs back to files on disk, shared by the API
+and the PDF renderer so neither goes through HTTP for local files.
+"""
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+from urllib.parse import unquote, urlsplit
+
+UPLOAD_URL_PREFIX = '/uploads/'
+
+
+@lru_cache(maxsize=1)
+def get_upload_dir() -> Path:
+    # Read on first use so values from .env (loaded by server.py) apply
+    return Path(os.environ.get('UPLOAD_DIR') or Path(__file__).parent.parent / 'uploads').resolve()
+
+
+def resolve_upload(image_url: str, base_url: str = None) -> Optional[Path]:
+    """File behind an /uploads/ URL (relative, or absolute on our own base_url); None if not local or missing"""
+    if base_url and image_url.startswith(base_url.rstrip('/') + UPLOAD_URL_PREFIX):
+        image_url = image_url[len(base_url.rstrip('/')):]
+    if not image_url.startswith(UPLOAD_URL_PREFIX):
+        return None
+    relative = unquote(urlsplit(image_url).path[len(UPLOAD_URL_PREFIX):])
+    upload_dir = get_upload_dir()
+    path = (upload_dir / relative).resolve()
+    # Reject ../ tricks that would escape the upload directory
+    if not path.is_relative_to(upload_dir) or not path.is_file():
+        return None
+    return path
@@ -0,0 +1,270 @@
+"""
+Visitor Analytics Rollups
+Keeps one visitor_rollups document per hour and per day (UTC), updated
+incrementally as visits are stored: $inc counters per page, country,
+device and browser, plus HyperLogLog registers merged with $max for
+unique IPs. Range queries read whole days from the day buckets and only
+the partial hours at the edges from the hour buckets.
+
+Pages come from the public tracking endpoint, so each dimension keeps at
+most VISITOR_ROLLUP_MAX_KEYS distinct keys per bucket; anything beyond
+that is counted under "(other)".
+
+Rebuild from scratch: python -m services.visitor_rollups rebuild
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import unquote
+
+logger = logging.getLogger(__name__)
+
+HOUR = 'hour'
+DAY = 'day'
+
+DIMENSIONS = {
+    'pages': 'page',
+    'countries': 'country',
+    'devices': 'device',
+    'browsers': 'browser',
+}
+
+OTHER = '(other)'
+MAX_KEYS = int(os.environ.get('VISITOR_ROLLUP_MAX_KEYS', '500'))
+
+_CONTROL_CHARS = re.compile(r'[\x00-\x1f\x7f]')
+
+# 2^12 registers: ~1.6% standard error, at most 4096 small ints per bucket
+HLL_PRECISION = 12
+HLL_REGISTERS = 1 << HLL_PRECISION
+_HLL_VALUE_BITS = 64 - HLL_PRECISION
+
+
+def normalize_page(page) -> str:
+    """Path part of a tracked page: no query string or fragment"""
+    page = str(page or '/').split('#', 1)[0].split('?', 1)[0]
+    return page or '/'
+
+
+def encode_key(value) -> str:
+    """Field-name safe form of a value: Mongo paths can't contain '.', NUL or start with '$'"""
+    value = _CONTROL_CHARS.sub('', str(value or ''))[:200] or 'Unknown'
+    return value.replace('%', '%25').replace('.', '%2E').replace('$', '%24')
+
+
+def decode_key(key: str) -> str:
+    return unquote(key)
+
+
+def _hll_register(ip: str) -> Tuple[int, int]:
+    """(register index, rank of the first set bit) for one IP"""
+    hashed = int.from_bytes(hashlib.blake2b(ip.encode(), digest_size=8).digest(), 'big')
+    index = hashed >> _HLL_VALUE_BITS
+    rest = hashed & ((1 << _HLL_VALUE_BITS) - 1)
+    return index, _HLL_VALUE_BITS - rest.bit_length() + 1
+
+
+def hll_estimate(registers: Dict[int, int]) -> int:
+    """Cardinality estimate from sparse registers (missing registers are zero)"""
+    alpha = 0.7213 / (1 + 1.079 / HLL_REGISTERS)
+    zeros = HLL_REGISTERS - len(registers)
+    total = zeros + sum(2.0 ** -rank for rank in registers.values())
+    estimate = alpha * HLL_REGISTERS * HLL_REGISTERS / total
+    if estimate <= 2.5 * HLL_REGISTERS and zeros:
+        # Linear counting is more accurate for small cardinalities
+        estimate = HLL_REGISTERS * math.log(HLL_REGISTERS / zeros)
+    return round(estimate)
+
+
+def _buckets(timestamp: str) -> List[Tuple[str, str]]:
+    """(period, bucket) pairs for an ISO UTC timestamp: '2024-05-01T13' and '2024-05-01'"""
+    return [(HOUR, timestamp[:13]), (DAY, timestamp[:10])]
+
+
+def _dimension_value(visit: dict, attribute: str):
+    value = visit.get(attribute)
+    return normalize_page(value) if attribute == 'page' else value
+
+
+def _cap_keys(counts: Dict[str, int], known: Set[str]) -> Dict[str, int]:
+    """Fold keys that would push a bucket past MAX_KEYS into OTHER"""
+    capped: Dict[str, int] = {}
+    room = MAX_KEYS - len(known)
+    for key, count in sorted(counts.items(), key=lambda item: item[1], reverse=True):
+        if key != OTHER and key not in known:
+            if room <= 0:
+                key = OTHER
+            else:
+                room -= 1
+        capped[key] = capped.get(key, 0) + count
+    return capped
+
+
+async def _write_rollup(db, period: str, bucket: str, rollup: dict, now: str):
+    existing = await db.visitor_rollups.find_one(
+        {'period': period, 'bucket': bucket},
+        {'_id': 0, **dict.fromkeys(DIMENSIONS, 1)}
+    ) or {}
+    inc = {'visits': rollup['visits']}
+    for field, counts in rollup['dimensions'].items():
+        for key, count in _cap_keys(counts, set(existing.get(field) or {})).items():
+            inc[f"{field}.{key}"] = count
+    await db.visitor_rollups.update_one(
+        {'period': period, 'bucket': bucket},
+        {'$inc': inc, '$max': rollup['hll'], '$set': {'updated_at': now}},
+        upsert=True
+    )
+
+
+async def record_visits(db, visits: Iterable[dict]):
+    """Fold a batch of stored visits into their hour and day rollups"""
+    rollups: Dict[Tuple[str, str], dict] = {}
+    for visit in visits:
+        timestamp = visit.get('timestamp')
+        if not timestamp:
+            continue
+        index, rank = _hll_register(visit.get('ip') or '')
+        keys = {field: encode_key(_dimension_value(visit, attribute)) for field, attribute in DIMENSIONS.items()}
+        for bucket_key in _buckets(timestamp):
+            rollup = rollups.setdefault(bucket_key, {
+                'visits': 0,
+                'dimensions': {field: {} for field in DIMENSIONS},
+                'hll': {},
+            })
+            rollup['visits'] += 1
+            for field, key in keys.items():
+                counts = rollup['dimensions'][field]
+                counts[key] = counts.get(key, 0) + 1
+            path = f"hll.r{index}"
+            if rank > rollup['hll'].get(path, 0):
+                rollup['hll'][path] = rank
+
+    now = datetime.now(timezone.utc).isoformat()
+    # One update per bucket so a failure only loses that bucket's counts
+    for (period, bucket), rollup in rollups.items():
+        try:
+            await _write_rollup(db, period, bucket, rollup, now)
+        except Exception as e:
+            logger.error(f"visitor_rollups update failed for {period} {bucket}: {e}")
+
+
+def _parse_time(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def _hour_key(moment: datetime) -> str:
+    return moment.strftime('%Y-%m-%dT%H')
+
+
+def _day_key(moment: datetime) -> str:
+    return moment.strftime('%Y-%m-%d')
+
+
+def _range_filter(start: datetime, end: datetime) -> Optional[dict]:
+    """Bucket filter covering [start, end), both rounded to whole hours"""
+    start = start.replace(minute=0, second=0, microsecond=0)
+    if end.minute or end.second or end.microsecond:
+        end = end.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    if end <= start:
+        return None
+
+    first_day = start.replace(hour=0)
+    if first_day < start:
+        first_day += timedelta(days=1)
+    last_day = end.replace(hour=0)
+    if last_day <= first_day:
+        return {'period': HOUR, 'bucket': {'$gte': _hour_key(start), '$lt': _hour_key(end)}}
+
+    clauses = [{'period': DAY, 'bucket': {'$gte': _day_key(first_day), '$lt': _day_key(last_day)}}]
+    if start < first_day:
+        clauses.append({'period': HOUR, 'bucket': {'$gte': _hour_key(start), '$lt': _hour_key(first_day)}})
+    if last_day < end:
+        clauses.append({'period': HOUR, 'bucket': {'$gte': _hour_key(last_day), '$lt': _hour_key(end)}})
+    return {'$or': clauses}
+
+
+def _top(counts: Dict[str, int], limit: int) -> Dict[str, int]:
+    ranked = sorted(counts.items(), key=lambda item: item[1], reverse=True)
+    return {decode_key(key): count for key, count in ranked[:limit]}
+
+
+async def get_visitor_stats(db, start: str, end: str, limit: int = 50) -> dict:
+    """Visit totals for [start, end) (ISO dates or datetimes, UTC if naive).
+    Raises ValueError for unparseable bounds."""
+    start_time, end_time = _parse_time(start), _parse_time(end)
+    totals = {field: {} for field in DIMENSIONS}
+    registers: Dict[int, int] = {}
+    visits = 0
+    buckets = 0
+
+    query = _range_filter(start_time, end_time)
+    if query is not None:
+        async for rollup in db.visitor_rollups.find(query, {'_id': 0}):
+            buckets += 1
+            visits += rollup.get('visits', 0)
+            for field in DIMENSIONS:
+                counts = totals[field]
+                for key, count in (rollup.get(field) or {}).items():
+                    counts[key] = counts.get(key, 0) + count
+            for key, rank in (rollup.get('hll') or {}).items():
+                index = int(key[1:])
+                if rank > registers.get(index, 0):
+                    registers[index] = rank
+
+    return {
+        'from': start_time.isoformat(),
+        'to': end_time.isoformat(),
+        'visits': visits,
+        'unique_visitors': hll_estimate(registers) if registers else 0,
+        **{field: _top(counts, limit) for field, counts in totals.items()},
+        'buckets': buckets,
+    }
+
+
+async def rebuild_visitor_rollups(db, batch_size: int = 1000) -> int:
+    """Recompute every rollup from the raw visitors collection"""
+    await db.visitor_rollups.delete_many({})
+    count = 0
+    batch = []
+    projection = dict.fromkeys(['timestamp', 'ip', *DIMENSIONS.values()], 1)
+    async for visit in db.visitors.find({}, {'_id': 0, **projection}):
+        batch.append(visit)
+        if len(batch) >= batch_size:
+            await record_visits(db, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        await record_visits(db, batch)
+        count += len(batch)
+    return count
+
+
+async def _main(command: str):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent.parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        if command == 'rebuild':
+            count = await rebuild_visitor_rollups(client[os.environ['DB_NAME']])
+            print(f"Rebuilt visitor_rollups from {count} visits")
+        else:
+            print("Usage: python -m services.visitor_rollups rebuild")
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    asyncio.run(_main(sys.argv[1] if len(sys.argv) > 1 else ''))
@@ -2,13 +2,78 @@
 Visitor Tracking Service
 Tracks website visitors with IP, location, browser info
 """
+import asyncio
+import logging
+import os
+import threading
 import requests
+from cachetools import LRUCache, TTLCache
+from pymongo.errors import BulkWriteError
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Callable, List, Optional
+from services.geoip import geoip
+from services.visitor_rollups import record_visits
 
+logger = logging.getLogger(__name__)
 
-def get_location_from_ip(ip: str) -> dict:
-    """Get location info from IP using ipapi.co (free tier)"""
+# ipapi.co is only a fallback: by default it is used when no local GeoIP database is configured
+_http_fallback_setting = os.environ.get('GEOIP_HTTP_FALLBACK', 'auto').lower()
+GEOIP_HTTP_FALLBACK = (
+    not geoip.configured if _http_fallback_setting == 'auto'
+    else _http_fallback_setting in ('1', 'true', 'yes')
+)
+
+UNKNOWN_LOCATION = {
+    'country': 'Unknown',
+    'city': 'Unknown',
+    'region': 'Unknown',
+    'timezone': 'UTC'
+}
+
+
+class LookupCache:
+    """Thread-safe cachetools cache with hit/miss counters (enrichment runs in worker threads)"""
+    
+    def __init__(self, cache):
+        self._cache = cache
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: str, compute: Callable[[str], dict], cacheable: Callable[[dict], bool] = None) -> dict:
+        with self._lock:
+            value = self._cache.get(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            self.misses += 1
+        value = compute(key)
+        if cacheable is None or cacheable(value):
+            with self._lock:
+                self._cache[key] = value
+        return value
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': len(self._cache),
+                'max_size': self._cache.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+# Locations can change (database updates), so they expire; UA parsing is deterministic
+location_cache = LookupCache(TTLCache(
+    maxsize=int(os.environ.get('GEOIP_CACHE_SIZE', '10000')),
+    ttl=float(os.environ.get('GEOIP_CACHE_TTL', '3600'))
+))
+user_agent_cache = LookupCache(LRUCache(maxsize=int(os.environ.get('USER_AGENT_CACHE_SIZE', '5000'))))
+
+
+def _lookup_location(ip: str) -> dict:
+    """Local GeoIP database first, then ipapi.co (free tier) if enabled.
+    Returns UNKNOWN_LOCATION itself when the lookup failed."""
     try:
         if ip in ['127.0.0.1', 'localhost', '::1']:
             return {
@@ -18,6 +83,12 @@ def get_location_from_ip(ip: str) -> dict:
                 'timezone': 'UTC'
             }
         
+        location = geoip.lookup(ip)
+        if location:
+            return location
+        if not GEOIP_HTTP_FALLBACK:
+            return UNKNOWN_LOCATION
+        
         response = requests.get(f'https://ipapi.co/{ip}/json/', timeout=3)
         if response.status_code == 200:
             data = response.json()
@@ -30,16 +101,32 @@ def get_location_from_ip(ip: str) -> dict:
     except Exception as e:
         print(f"Location lookup error: {e}")
     
+    return UNKNOWN_LOCATION
+
+
+def get_location_from_ip(ip: str) -> dict:
+    """Get location info from IP (cached; treat the result as read-only)"""
+    return location_cache.get(
+        ip,
+        _lookup_location,
+        # A failed ipapi.co call may succeed later, so only cache answers
+        cacheable=lambda location: location is not UNKNOWN_LOCATION or not GEOIP_HTTP_FALLBACK
+    )
+
+
+def parse_user_agent(user_agent: str) -> dict:
+    """Parse browser and OS from user agent string (cached; treat the result as read-only)"""
+    return user_agent_cache.get(user_agent, _parse_user_agent)
+
+
+def enrichment_cache_stats() -> dict:
     return {
-        'country': 'Unknown',
-        'city': 'Unknown',
-        'region': 'Unknown',
-        'timezone': 'UTC'
+        'location_cache': location_cache.stats(),
+        'user_agent_cache': user_agent_cache.stats(),
     }
 
 
-def parse_user_agent(user_agent: str) -> dict:
-    """Parse browser and OS from user agent string"""
+def _parse_user_agent(user_agent: str) -> dict:
     ua = user_agent.lower()
     
     # Browser detection
@@ -83,28 +170,152 @@ def parse_user_agent(user_agent: str) -> dict:
     }
 
 
-async def track_visitor(db, ip: str, user_agent: str, page: str):
-    """Track a visitor to the database"""
-    try:
-        location = get_location_from_ip(ip)
-        browser_info = parse_user_agent(user_agent)
-        
-        visitor_data = {
-            'ip': ip,
-            'page': page,
-            'timestamp': datetime.now(timezone.utc).isoformat(),
-            'country': location['country'],
-            'city': location['city'],
-            'region': location['region'],
-            'timezone': location['timezone'],
-            'browser': browser_info['browser'],
-            'os': browser_info['os'],
-            'device': browser_info['device'],
-            'user_agent': browser_info['user_agent']
-        }
-        
-        await db.visitors.insert_one(visitor_data)
+def build_visit(ip: str, user_agent: str, page: str, timestamp: str) -> dict:
+    """Enriched visitor document (blocking: may call the location API)"""
+    location = get_location_from_ip(ip)
+    browser_info = parse_user_agent(user_agent)
+    
+    return {
+        'ip': ip,
+        'page': page,
+        'timestamp': timestamp,
+        'country': location['country'],
+        'city': location['city'],
+        'region': location['region'],
+        'timezone': location['timezone'],
+        'browser': browser_info['browser'],
+        'os': browser_info['os'],
+        'device': browser_info['device'],
+        'user_agent': browser_info['user_agent']
+    }
+
+
+class VisitorQueue:
+    """Bounded in-process queue of page views; consumers enrich them off the
+    request path and a writer stores them in batches with unordered insert_many
+    (every VISITOR_BATCH_SIZE events or VISITOR_FLUSH_MS, whichever comes first).
+    When Mongo falls behind, the write buffer fills, consumers wait, and new
+    hits are dropped (and counted) once the intake queue is full. Stored
+    visits are folded into the hourly/daily visitor_rollups."""
+    
+    def __init__(self):
+        self.max_size = int(os.environ.get('VISITOR_QUEUE_SIZE', '10000'))
+        self.workers = int(os.environ.get('VISITOR_WORKERS', '4'))
+        self.batch_size = int(os.environ.get('VISITOR_BATCH_SIZE', '100'))
+        self.flush_interval = int(os.environ.get('VISITOR_FLUSH_MS', '1000')) / 1000
+        self.max_pending_writes = int(os.environ.get('VISITOR_MAX_PENDING_WRITES', str(self.batch_size * 5)))
+        self.drain_timeout = float(os.environ.get('VISITOR_DRAIN_TIMEOUT', '5'))
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._db = None
+        self.accepted = 0
+        self.dropped = 0
+        self.stored = 0
+        self.failed = 0
+        self.batches = 0
+    
+    def submit(self, ip: str, user_agent: str, page: str) -> bool:
+        """Queue a hit without waiting; False if it was dropped"""
+        if self._queue is None:
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait((ip, user_agent, page, datetime.now(timezone.utc).isoformat()))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.accepted += 1
         return True
-    except Exception as e:
-        print(f"Visitor tracking error: {e}")
-        return False
+    
+    async def _consume(self):
+        while True:
+            ip, user_agent, page, timestamp = await self._queue.get()
+            try:
+                visit = await asyncio.to_thread(build_visit, ip, user_agent, page, timestamp)
+                # Blocks while the write buffer is full: backpressure from Mongo
+                await self._pending.put(visit)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Visitor tracking error: {e}")
+            finally:
+                self._queue.task_done()
+    
+    async def _write(self, batch: List[dict]):
+        try:
+            await self._db.visitors.insert_many(batch, ordered=False)
+            stored = batch
+        except BulkWriteError as e:
+            rejected = {error['index'] for error in e.details.get('writeErrors', [])}
+            stored = [visit for i, visit in enumerate(batch) if i not in rejected]
+            logger.error(f"Visitor batch partially failed: {len(batch) - len(stored)} of {len(batch)} not stored")
+        except Exception as e:
+            stored = []
+            logger.error(f"Visitor batch write error: {e}")
+        self.stored += len(stored)
+        self.failed += len(batch) - len(stored)
+        self.batches += 1
+        if stored:
+            await record_visits(self._db, stored)
+    
+    async def _flush_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._pending.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._pending.get(), timeout=timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._write(batch)
+            for _ in batch:
+                self._pending.task_done()
+    
+    def start(self, db):
+        if self._tasks:
+            return
+        self._db = db
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._pending = asyncio.Queue(maxsize=self.max_pending_writes)
+        self._tasks = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._flush_loop()))
+    
+    async def stop(self):
+        """Enrich and write out everything still queued (bounded by VISITOR_DRAIN_TIMEOUT), then stop"""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._drain(), timeout=self.drain_timeout)
+        except asyncio.TimeoutError:
+            lost = self._queue.qsize() + self._pending.qsize()
+            logger.warning(f"Dropping {lost} queued visits on shutdown")
+            self.dropped += lost
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._pending = None
+    
+    async def _drain(self):
+        await self._queue.join()
+        await self._pending.join()
+    
+    def stats(self) -> dict:
+        return {
+            'queue_size': self._queue.qsize() if self._queue is not None else 0,
+            'max_size': self.max_size,
+            'pending_writes': self._pending.qsize() if self._pending is not None else 0,
+            'accepted': self.accepted,
+            'dropped': self.dropped,
+            'stored': self.stored,
+            'failed': self.failed,
+            'batches': self.batches,
+        }
+
+
+visitor_queue = VisitorQueue()
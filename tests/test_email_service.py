@@ -0,0 +1,112 @@
+"""
+EmailService.send_many against a local aiosmtpd server
+"""
+import socket
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("aiosmtpd")
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from services.email_service import EmailService  # noqa: E402
+
+SERVER_IDLE_TIMEOUT = 0.5
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.recipients = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.recipients.extend(envelope.rcpt_tos)
+        return "250 OK"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = Controller(
+        handler,
+        hostname="127.0.0.1",
+        port=_free_port(),
+        authenticator=lambda server, session, envelope, mechanism, auth_data: AuthResult(success=True),
+        auth_require_tls=False,
+        # Drop idle clients quickly, like a real server closing pooled sessions
+        timeout=SERVER_IDLE_TIMEOUT,
+    )
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+
+@pytest.fixture
+def service(smtp_server, monkeypatch):
+    controller, _ = smtp_server
+    monkeypatch.setenv("SMTP_SERVER", controller.hostname)
+    monkeypatch.setenv("SMTP_PORT", str(controller.port))
+    monkeypatch.setenv("SMTP_USERNAME", "user")
+    monkeypatch.setenv("SMTP_PASSWORD", "secret")
+    monkeypatch.setenv("FROM_EMAIL", "shop@example.com")
+    monkeypatch.setenv("SMTP_STARTTLS", "false")
+    monkeypatch.setenv("SMTP_TIMEOUT", "5")
+    monkeypatch.setenv("SMTP_HEALTHCHECK_AFTER", "5")
+    email_service = EmailService()
+    yield email_service
+    email_service.pool.close_idle()
+
+
+def _messages(count: int):
+    return [
+        {"to_email": f"customer{i}@example.com", "subject": f"Teklif {i}", "html_content": "<p>Merhaba</p>"}
+        for i in range(count)
+    ]
+
+
+def test_send_many_reuses_one_session(service, smtp_server):
+    _, handler = smtp_server
+
+    assert service.send_many(_messages(3)) == [None, None, None]
+    assert service.send_many(_messages(2)) == [None, None]
+
+    assert len(handler.recipients) == 5
+    assert service.pool.stats()["created"] == 1
+    assert service.pool.stats()["reused"] == 1
+
+
+def test_send_many_replaces_session_closed_by_server(service, smtp_server):
+    _, handler = smtp_server
+    assert service.send_many(_messages(1)) == [None]
+
+    # The pooled session is younger than SMTP_HEALTHCHECK_AFTER, so it is
+    # reused without a NOOP even though the server has dropped it
+    time.sleep(SERVER_IDLE_TIMEOUT * 3)
+
+    assert service.send_many(_messages(5)) == [None] * 5
+    assert len(handler.recipients) == 6
+    assert service.pool.stats()["created"] == 2
+
+
+def test_send_many_fails_batch_when_server_unreachable(monkeypatch):
+    monkeypatch.setenv("SMTP_SERVER", "127.0.0.1")
+    monkeypatch.setenv("SMTP_PORT", str(_free_port()))
+    monkeypatch.setenv("SMTP_USERNAME", "user")
+    monkeypatch.setenv("SMTP_PASSWORD", "secret")
+    monkeypatch.setenv("SMTP_STARTTLS", "false")
+    service = EmailService()
+
+    results = service.send_many(_messages(3))
+
+    assert all(isinstance(error, OSError) for error in results)
+    assert service.pool.stats()["created"] == 0